@@ -0,0 +1,115 @@
+"""Compares the ffmpeg streaming and MoviePy audio extraction backends.
+
+Generates a synthetic screen-recording style MP4, then runs each backend in its own
+child process (extraction and chunk encoding only, nothing is uploaded) and reports
+wall time, time until the first chunk was ready and peak RSS.
+
+    python benchmarks/audio_extraction.py --minutes 20
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def generate_video(path: str, minutes: float, ffmpeg_path: str) -> None:
+    seconds = str(int(minutes * 60))
+    subprocess.run([
+        ffmpeg_path, "-y", "-loglevel", "error",
+        "-f", "lavfi", "-i", "testsrc2=size=1280x720:rate=30",
+        "-f", "lavfi", "-i", "sine=frequency=440:sample_rate=44100",
+        "-t", seconds, "-c:v", "mpeg4", "-q:v", "10", "-c:a", "aac", "-b:a", "128k",
+        path
+    ], check=True)
+
+
+def run_backend(backend: str, video_path: str) -> dict:
+    sys.path.insert(0, REPO_ROOT)
+    os.chdir(REPO_ROOT)
+    import main
+
+    start = time.perf_counter()
+    first_chunk = None
+    chunk_count = 0
+    chunk_bytes = 0
+    video = None
+
+    if backend == "ffmpeg":
+        ffmpeg_path = main.DataProcessor.find_ffmpeg()
+        blocks = main.DataProcessor.stream_audio_blocks(video_path, ffmpeg_path)
+        chunker = main.AudioChunker(ffmpeg_path=ffmpeg_path, codec=main.CHUNK_CODEC)
+    else:
+        from moviepy.editor import VideoFileClip
+        video = VideoFileClip(video_path)
+        blocks = main.DataProcessor.read_audio_blocks(video)
+        chunker = main.AudioChunker()
+
+    for chunk in chunker.split(blocks):
+        if first_chunk is None:
+            first_chunk = time.perf_counter() - start
+        chunk_count += 1
+        chunk_bytes += len(chunk.data)
+
+    if video:
+        video.close()
+
+    return {
+        "backend": backend,
+        "wall_seconds": round(time.perf_counter() - start, 2),
+        "first_chunk_seconds": round(first_chunk or 0.0, 2),
+        "chunks": chunk_count,
+        "upload_mb": round(chunk_bytes / 1e6, 2),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "peak_child_rss_mb": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024, 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--minutes", type=float, default=20)
+    parser.add_argument("--backends", default="ffmpeg,moviepy")
+    parser.add_argument("--video", help="Use an existing MP4 instead of generating one")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_backend(args.worker, args.video)))
+        return
+
+    sys.path.insert(0, REPO_ROOT)
+    os.chdir(REPO_ROOT)
+    import main as story_slammer
+
+    ffmpeg_path = story_slammer.DataProcessor.find_ffmpeg()
+    if not ffmpeg_path:
+        sys.exit("ffmpeg is required to generate the benchmark video.")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        video_path = args.video
+        if not video_path:
+            video_path = os.path.join(temp_dir, "synthetic.mp4")
+            print(f"Generating {args.minutes} minute synthetic recording...")
+            generate_video(video_path, args.minutes, ffmpeg_path)
+
+        print(f"{'backend':<10}{'wall s':>10}{'first chunk s':>16}{'chunks':>8}{'upload MB':>12}{'peak RSS MB':>14}{'ffmpeg RSS MB':>16}")
+        for backend in args.backends.split(","):
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--worker", backend, "--video", video_path],
+                capture_output=True, text=True
+            )
+            if output.returncode != 0:
+                print(f"{backend:<10} failed: {output.stderr.strip().splitlines()[-1] if output.stderr.strip() else output.returncode}")
+                continue
+            result = json.loads(output.stdout.strip().splitlines()[-1])
+            print(f"{result['backend']:<10}{result['wall_seconds']:>10}{result['first_chunk_seconds']:>16}{result['chunks']:>8}"
+                  f"{result['upload_mb']:>12}{result['peak_rss_mb']:>14}{result['peak_child_rss_mb']:>16}")
+
+
+if __name__ == "__main__":
+    main()
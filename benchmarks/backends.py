@@ -0,0 +1,316 @@
+"""Offline stand-ins for the Whisper, Claude and Jira clients that StorySlammer accepts.
+
+Fake backends are deterministic and need no network: FakeClaude answers messages.create,
+messages.stream and messages.count_tokens (with simulated prompt caching and a Jira tool
+call for questions that mention an unseen card), and FakeWhisper answers
+audio.transcriptions.create. Both add configurable latency.
+
+Recording backends wrap live clients and save every response to a fixture directory, and
+replay backends serve those fixtures back, so a real session can be re-run offline:
+
+    claude = RecordingClaude(anthropic.Anthropic(), "fixtures/")   # once, with keys
+    claude = ReplayClaude("fixtures/", latency=0.5)                 # afterwards, offline
+
+recording_jira_client() makes a JiraClient save every issue it downloads to a file that
+fake_jira.FakeJira can serve with load_issues().
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from types import SimpleNamespace
+from typing import Any, Dict, Iterator, List
+
+ISSUE_KEY_PATTERN = re.compile(r"\b[A-Z][A-Z0-9_]*-\d+\b")
+# Rough size of 16 kHz mono FLAC speech, used to turn upload sizes into audio durations
+FLAC_BYTES_PER_SECOND = 18000
+
+
+def as_object(value: Any) -> Any:
+    """Turns recorded JSON back into attribute-style objects like the SDK response models. Tool inputs
+    stay plain dicts, as they are in the SDK."""
+    if isinstance(value, dict):
+        return SimpleNamespace(**{key: item if key == "input" else as_object(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return [as_object(item) for item in value]
+    return value
+
+
+def as_dict(value: Any) -> Any:
+    if hasattr(value, "model_dump"):
+        return value.model_dump()
+    if isinstance(value, SimpleNamespace):
+        return {key: as_dict(item) for key, item in vars(value).items()}
+    if isinstance(value, list):
+        return [as_dict(item) for item in value]
+    return value
+
+
+def request_key(request: Dict[str, Any]) -> str:
+    return hashlib.sha256(json.dumps(as_dict(request), sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class Counter:
+    """Thread-safe request and byte counters shared by the backends."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts: Dict[str, int] = {}
+
+    def add(self, name: str, amount: int = 1) -> None:
+        with self.lock:
+            self.counts[name] = self.counts.get(name, 0) + amount
+
+
+class FakeStream:
+    def __init__(self, message: Any, delay_per_chunk: float):
+        self.message = message
+        self.delay_per_chunk = delay_per_chunk
+
+    def __enter__(self) -> "FakeStream":
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        pass
+
+    @property
+    def text_stream(self) -> Iterator[str]:
+        for block in self.message.content:
+            if block.type != "text":
+                continue
+            for start in range(0, len(block.text), 16):
+                time.sleep(self.delay_per_chunk)
+                yield block.text[start:start + 16]
+
+    def get_final_message(self) -> Any:
+        return self.message
+
+
+class FakeMessages:
+    def __init__(self, claude: "FakeClaude"):
+        self.claude = claude
+
+    def create(self, **request: Any) -> Any:
+        self.claude.counter.add("claude.create")
+        time.sleep(self.claude.latency)
+        return self.claude.respond(request)
+
+    def stream(self, **request: Any) -> FakeStream:
+        self.claude.counter.add("claude.stream")
+        time.sleep(self.claude.latency)
+        return FakeStream(self.claude.respond(request), 4 / self.claude.tokens_per_second if self.claude.tokens_per_second else 0)
+
+    def count_tokens(self, **request: Any) -> Any:
+        self.claude.counter.add("claude.count_tokens")
+        return SimpleNamespace(input_tokens=sum(len(segment) for segment in self.claude.segments(request)) // 4)
+
+
+class FakeClaude:
+    """Deterministic Anthropic client. Summaries and answers are built from the request, token usage
+    is estimated at 4 characters per token and prompt caching is simulated from the cache_control
+    breakpoints, so cache hit rates behave like the real API across a session."""
+
+    def __init__(self, latency: float = 0.0, tokens_per_second: float = 0.0, summary_words: int = 400):
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.summary_words = summary_words
+        self.counter = Counter()
+        self.cached_prefixes = set()
+        self.lock = threading.Lock()
+        self.messages = FakeMessages(self)
+
+    @staticmethod
+    def segments(request: Dict[str, Any]) -> List[str]:
+        system = request.get("system", "")
+        return [json.dumps(as_dict(system), default=str)] + [json.dumps(as_dict(message), default=str) for message in request.get("messages", [])]
+
+    def usage(self, request: Dict[str, Any], output_text: str) -> SimpleNamespace:
+        segments = self.segments(request)
+        total = sum(len(segment) for segment in segments) // 4
+        cached = written = 0
+        prefix = hashlib.sha256()
+        prefix_tokens = 0
+        with self.lock:
+            for segment in segments:
+                prefix.update(segment.encode("utf-8"))
+                prefix_tokens += len(segment) // 4
+                if "cache_control" not in segment:
+                    continue
+                digest = prefix.hexdigest()
+                if digest in self.cached_prefixes:
+                    cached = prefix_tokens
+                else:
+                    written = prefix_tokens - cached
+                    self.cached_prefixes.add(digest)
+        return SimpleNamespace(input_tokens=max(total - cached - written, 0), cache_read_input_tokens=cached,
+                               cache_creation_input_tokens=written, output_tokens=len(output_text) // 4)
+
+    def respond(self, request: Dict[str, Any]) -> SimpleNamespace:
+        messages = request.get("messages", [])
+        last = messages[-1]["content"] if messages else ""
+        last_text = last if isinstance(last, str) else " ".join(
+            block.get("text", "") if isinstance(block, dict) else getattr(block, "text", "") for block in last)
+        seen = json.dumps(as_dict(messages[:-1]), default=str)
+
+        tool_names = [tool["name"] for tool in request.get("tools", [])]
+        answering_tool = not isinstance(last, str) and any(as_dict(block).get("type") == "tool_result" for block in last)
+        if "Jira" in tool_names and request.get("tool_choice", {}).get("type") != "none" and not answering_tool:
+            unseen = [key for key in ISSUE_KEY_PATTERN.findall(last_text) if f"<key>{key}</key>" not in seen]
+            if unseen:
+                tool_uses = [SimpleNamespace(type="tool_use", id=f"toolu_{index}_{key}", name="Jira", input={"card_name": key})
+                             for index, key in enumerate(unseen)]
+                return SimpleNamespace(content=tool_uses, stop_reason="tool_use", usage=self.usage(request, ""))
+
+        keys = sorted(set(ISSUE_KEY_PATTERN.findall(last_text)))[:20]
+        words = (f"Summary covering {', '.join(keys) or 'the request'}. " * self.summary_words).split()[:self.summary_words]
+        if request.get("max_tokens", 0) < 2000:
+            words = words[:self.summary_words // 4]
+        text = " ".join(words)
+        return SimpleNamespace(content=[SimpleNamespace(type="text", text=text)], stop_reason="end_turn", usage=self.usage(request, text))
+
+
+class FakeTranscriptions:
+    def __init__(self, whisper: "FakeWhisper"):
+        self.whisper = whisper
+
+    def create(self, model: str, file: Any, response_format: str = "json") -> Any:
+        filename, data = file
+        self.whisper.counter.add("whisper.create")
+        self.whisper.counter.add("whisper.bytes", len(data))
+        upload_seconds = len(data) / self.whisper.upload_bytes_per_second if self.whisper.upload_bytes_per_second else 0
+        time.sleep(self.whisper.latency + upload_seconds)
+
+        duration = max(len(data) / FLAC_BYTES_PER_SECOND, 1.0)
+        seed = hashlib.sha256(data[:4096]).hexdigest()[:8]
+        segments = [SimpleNamespace(start=float(start), end=float(min(start + 10, duration)), text=f" Segment {seed}-{start // 10} discussing the card.")
+                    for start in range(0, int(duration), 10)] or [SimpleNamespace(start=0.0, end=duration, text=f" Segment {seed}.")]
+        return SimpleNamespace(text="".join(segment.text for segment in segments), segments=segments)
+
+
+class FakeWhisper:
+    """Deterministic OpenAI client for audio.transcriptions.create. Latency is a fixed delay plus the
+    upload time at upload_bytes_per_second."""
+
+    def __init__(self, latency: float = 0.0, upload_bytes_per_second: float = 0.0):
+        self.latency = latency
+        self.upload_bytes_per_second = upload_bytes_per_second
+        self.counter = Counter()
+        self.audio = SimpleNamespace(transcriptions=FakeTranscriptions(self))
+
+
+class FixtureStore:
+    """One JSON file per recorded response, named by the hash of the request."""
+
+    def __init__(self, directory: str, kind: str):
+        self.directory = os.path.join(directory, kind)
+        os.makedirs(self.directory, exist_ok=True)
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def save(self, key: str, value: Any) -> None:
+        with open(self.path(key), "w", encoding="utf-8") as f:
+            json.dump(as_dict(value), f, default=str)
+
+    def load(self, key: str) -> Any:
+        if not os.path.exists(self.path(key)):
+            raise KeyError(f"No recorded response for request {key[:12]} in {self.directory}; record the session first.")
+        with open(self.path(key), "r", encoding="utf-8") as f:
+            return as_object(json.load(f))
+
+
+class RecordingClaude:
+    """Wraps a live Anthropic client and saves every response, keyed by the request."""
+
+    def __init__(self, client: Any, directory: str):
+        self.client = client
+        self.store = FixtureStore(directory, "claude")
+        self.messages = self
+
+    def create(self, **request: Any) -> Any:
+        response = self.client.messages.create(**request)
+        self.store.save(request_key(request), response)
+        return response
+
+    def stream(self, **request: Any) -> Any:
+        # Recorded without streaming; the replay streams the recorded text back
+        return FakeStream(self.create(**request), 0)
+
+    def count_tokens(self, **request: Any) -> Any:
+        response = self.client.messages.count_tokens(**request)
+        self.store.save(request_key({"count_tokens": request}), response)
+        return response
+
+
+class ReplayClaude:
+    """Serves responses recorded by RecordingClaude, with optional latency."""
+
+    def __init__(self, directory: str, latency: float = 0.0):
+        self.store = FixtureStore(directory, "claude")
+        self.latency = latency
+        self.counter = Counter()
+        self.messages = self
+
+    def create(self, **request: Any) -> Any:
+        self.counter.add("claude.create")
+        time.sleep(self.latency)
+        return self.store.load(request_key(request))
+
+    def stream(self, **request: Any) -> FakeStream:
+        return FakeStream(self.create(**request), 0)
+
+    def count_tokens(self, **request: Any) -> Any:
+        self.counter.add("claude.count_tokens")
+        return self.store.load(request_key({"count_tokens": request}))
+
+
+class RecordingWhisper:
+    """Wraps a live OpenAI client and saves every transcription, keyed by the uploaded audio."""
+
+    def __init__(self, client: Any, directory: str):
+        self.client = client
+        self.store = FixtureStore(directory, "whisper")
+        self.audio = SimpleNamespace(transcriptions=self)
+
+    def create(self, model: str, file: Any, response_format: str = "json") -> Any:
+        response = self.client.audio.transcriptions.create(model=model, file=file, response_format=response_format)
+        self.store.save(hashlib.sha256(file[1]).hexdigest(), response)
+        return response
+
+
+class ReplayWhisper:
+    """Serves transcriptions recorded by RecordingWhisper, with optional latency."""
+
+    def __init__(self, directory: str, latency: float = 0.0):
+        self.store = FixtureStore(directory, "whisper")
+        self.latency = latency
+        self.counter = Counter()
+        self.audio = SimpleNamespace(transcriptions=self)
+
+    def create(self, model: str, file: Any, response_format: str = "json") -> Any:
+        self.counter.add("whisper.create")
+        time.sleep(self.latency)
+        return self.store.load(hashlib.sha256(file[1]).hexdigest())
+
+
+def recording_jira_client(jira_client: Any, path: str) -> Any:
+    """Makes a main.JiraClient save every issue it downloads to path, in the format FakeJira.load_issues reads."""
+    issues: Dict[str, Dict[str, Any]] = {}
+    lock = threading.Lock()
+    request = jira_client.request
+
+    def recording_request(method: str, endpoint: str, **kwargs: Any) -> Any:
+        response = request(method, endpoint, **kwargs)
+        if response.status_code == 200:
+            payload = response.json()
+            with lock:
+                for issue in payload.get("issues", [payload] if "key" in payload else []):
+                    issues.setdefault(issue["key"], {"key": issue["key"], "fields": {}})["fields"].update(issue.get("fields", {}))
+                with open(path, "w", encoding="utf-8") as f:
+                    json.dump(issues, f, indent=2)
+        return response
+
+    jira_client.request = recording_request
+    return jira_client
@@ -0,0 +1,200 @@
+"""Runs complete Story Slammer flows offline and reports wall time, peak memory and request counts.
+
+Every scenario runs in its own child process against the fake Jira server and the fake (or
+replayed) Whisper and Claude backends from backends.py, with a fresh cache and vault:
+
+    single   ingest notes and images for one card and write its summary
+    batch    summarize --cards cards of one epic in batch mode
+    chat     summarize one card, then ask --questions questions, some about cards of another project
+    recording  transcribe a generated --recording-minutes recording and summarize it
+
+    python benchmarks/end_to_end.py --claude-latency 0.5 --whisper-latency 1 --jira-latency 0.05
+    python benchmarks/end_to_end.py --backend record --fixtures fixtures/   # live Claude and Whisper, needs keys
+    python benchmarks/end_to_end.py --backend replay --fixtures fixtures/   # replays that recording offline
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+SCENARIOS = ("single", "batch", "chat", "recording")
+CARD = "PROJ-3"
+
+
+def generate_recording(path: str, minutes: float, ffmpeg_path: str) -> None:
+    # A tone that goes silent for one second every minute, so the chunker finds natural split points
+    subprocess.run([
+        ffmpeg_path, "-y", "-loglevel", "error",
+        "-f", "lavfi", "-i", "testsrc2=size=320x240:rate=1",
+        "-f", "lavfi", "-i", "sine=frequency=300:sample_rate=16000,volume='if(lt(mod(t,60),1),0,1)':eval=frame",
+        "-t", str(int(minutes * 60)), "-c:v", "mpeg4", "-c:a", "aac", "-b:a", "48k", path
+    ], check=True)
+
+
+def generate_inputs(directory: str) -> tuple:
+    from PIL import Image, ImageDraw
+
+    notes_path = os.path.join(directory, "notes.md")
+    with open(notes_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(f"- Decision {index}: keep the checkout flow behind the feature flag for PROJ-{index}" for index in range(200)))
+
+    images_path = os.path.join(directory, "images")
+    os.makedirs(images_path)
+    for index in range(6):
+        image = Image.new("RGB", (1920, 1080), (240, 240, 240))
+        draw = ImageDraw.Draw(image)
+        for row in range(0, 1080, 40):
+            draw.text((40, row), f"Screen {index} line {row // 40}: checkout step {index} " * 4, fill=(20, 20, 20))
+        image.save(os.path.join(images_path, f"screen_{index}.png"))
+    return notes_path, images_path
+
+
+def create_backends(args: argparse.Namespace) -> tuple:
+    import backends
+
+    if args.backend == "fake":
+        return (backends.FakeWhisper(args.whisper_latency, args.upload_mbps * 1e6 / 8),
+                backends.FakeClaude(args.claude_latency, args.stream_tps))
+    if args.backend == "replay":
+        return backends.ReplayWhisper(args.fixtures, args.whisper_latency), backends.ReplayClaude(args.fixtures, args.claude_latency)
+
+    import anthropic
+    from openai import OpenAI
+    return (backends.RecordingWhisper(OpenAI(api_key=os.getenv("OPENAI_API_KEY")), args.fixtures),
+            backends.RecordingClaude(anthropic.Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY")), args.fixtures))
+
+
+def run_scenario(args: argparse.Namespace) -> dict:
+    from fake_jira import FakeJira, make_epic
+
+    # A second project whose cards are only reachable through the Jira tool during the chat
+    issues = {**make_epic(children=max(args.cards, 10)), **make_epic("OPS", children=10)}
+    fake_jira = FakeJira(issues, latency=args.jira_latency).start()
+    os.environ["JIRA_BASE_URL"] = fake_jira.base_url
+
+    work_dir = tempfile.mkdtemp(prefix="story_slammer_bench_")
+    os.symlink(os.path.join(REPO_ROOT, "prompts"), os.path.join(work_dir, "prompts"))
+    vault_path = os.path.join(work_dir, "vault")
+    os.makedirs(vault_path)
+    notes_path, images_path = generate_inputs(work_dir)
+    os.chdir(work_dir)
+
+    sys.path.insert(0, REPO_ROOT)
+    import main
+    from dataclasses import replace
+
+    whisper, claude = create_backends(args)
+    story_slammer = main.StorySlammer(whisper, claude)
+    config = replace(story_slammer.config, vault_path=vault_path)
+
+    start = time.perf_counter()
+    if args.worker == "single":
+        config = replace(config, notes_path=notes_path, images_path=images_path)
+        story_slammer.summarize(CARD, config)
+    elif args.worker == "batch":
+        keys = [f"PROJ-{number}" for number in range(2, args.cards + 2)]
+        story_slammer.run_batch(keys=keys, vault_path=vault_path, concurrency=args.concurrency)
+    elif args.worker == "chat":
+        config = replace(config, notes_path=notes_path)
+        conversation_history = story_slammer.ingest(CARD, config)
+        conversation_history.append({"role": "assistant", "content": story_slammer.summarize(CARD, config, conversation_history)})
+        assistant = story_slammer.ai_assistant
+        assistant.vault_index = main.VaultIndex(vault_path).refresh()
+        history = main.ConversationHistory(assistant.prepare_chat(conversation_history), assistant.summarize_history)
+        for number in range(args.questions):
+            other_card = f"OPS-{1 + number % 11}"
+            question = f"How does {other_card} affect {CARD}?" if number % 3 == 0 else f"What is the risk number {number} for this card?"
+            assistant.ask(history, question)
+    elif args.worker == "recording":
+        config = replace(config, recording_path=args.video)
+        story_slammer.summarize(CARD, config)
+    wall = time.perf_counter() - start
+
+    stages = main.Tracer.summary()
+    own, children = resource.getrusage(resource.RUSAGE_SELF), resource.getrusage(resource.RUSAGE_CHILDREN)
+    counts = {}
+    for backend in (whisper, claude):
+        if hasattr(backend, "counter"):
+            counts.update(backend.counter.counts)
+    fake_jira.stop()
+    return {
+        "scenario": args.worker,
+        "wall_seconds": round(wall, 2),
+        "peak_rss_mb": round(own.ru_maxrss / 1024, 1),
+        "peak_child_rss_mb": round(children.ru_maxrss / 1024, 1),
+        "claude_requests": sum(stage["calls"] for stage in stages if stage["stage"] == "claude.messages"),
+        "whisper_requests": sum(stage["calls"] for stage in stages if stage["stage"] == "whisper.transcribe"),
+        "upload_mb": round(sum(stage["bytes_sent"] for stage in stages if stage["stage"] == "whisper.transcribe") / 1e6, 2),
+        "jira_requests": len(fake_jira.requests),
+        "jira_connections": fake_jira.connections,
+        "input_tokens": sum(stage["input_tokens"] + stage["cache_read_tokens"] + stage["cache_write_tokens"] for stage in stages),
+        "cached_tokens": sum(stage["cache_read_tokens"] for stage in stages),
+        "backend_counts": counts,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--backend", choices=["fake", "record", "replay"], default="fake")
+    parser.add_argument("--fixtures", default=os.path.join(REPO_ROOT, "benchmarks", "fixtures"),
+                        help="Directory the record backend writes to and the replay backend reads from")
+    parser.add_argument("--claude-latency", type=float, default=0.0, help="Seconds before each Claude response")
+    parser.add_argument("--stream-tps", type=float, default=0.0, help="Streaming speed of the fake Claude in tokens per second (0 is instant)")
+    parser.add_argument("--whisper-latency", type=float, default=0.0, help="Seconds before each Whisper response")
+    parser.add_argument("--upload-mbps", type=float, default=0.0, help="Simulated upload bandwidth to Whisper in Mbit/s (0 is unlimited)")
+    parser.add_argument("--jira-latency", type=float, default=0.0, help="Seconds added to every fake Jira response")
+    parser.add_argument("--cards", type=int, default=20, help="Cards summarized in the batch scenario")
+    parser.add_argument("--concurrency", type=int, default=4, help="Batch concurrency")
+    parser.add_argument("--questions", type=int, default=30, help="Questions asked in the chat scenario")
+    parser.add_argument("--recording-minutes", type=float, default=30)
+    parser.add_argument("--video", help=argparse.SUPPRESS)
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_scenario(args)))
+        return
+
+    sys.path.insert(0, REPO_ROOT)
+    import main as story_slammer
+
+    scenarios = [scenario for scenario in args.scenarios.split(",") if scenario]
+    with tempfile.TemporaryDirectory() as temp_dir:
+        if "recording" in scenarios:
+            ffmpeg_path = story_slammer.DataProcessor.find_ffmpeg()
+            if not ffmpeg_path:
+                print("Skipping the recording scenario: ffmpeg is required to generate the recording.")
+                scenarios.remove("recording")
+            else:
+                args.video = os.path.join(temp_dir, "meeting.mp4")
+                print(f"Generating {args.recording_minutes} minute recording...")
+                generate_recording(args.video, args.recording_minutes, ffmpeg_path)
+
+        print(f"{'scenario':<11}{'wall s':>8}{'RSS MB':>8}{'ffmpeg MB':>10}{'claude':>8}{'whisper':>9}{'upload MB':>10}"
+              f"{'jira':>6}{'conns':>6}{'input tok':>11}{'cached':>8}")
+        for scenario in scenarios:
+            command = [sys.executable, os.path.abspath(__file__), *sys.argv[1:], "--worker", scenario]
+            if args.video:
+                command += ["--video", args.video]
+            output = subprocess.run(command, capture_output=True, text=True)
+            if output.returncode != 0:
+                error = output.stderr.strip().splitlines()
+                print(f"{scenario:<11} failed: {error[-1] if error else output.returncode}")
+                continue
+            result = json.loads(output.stdout.strip().splitlines()[-1])
+            cached_share = 100 * result["cached_tokens"] / max(result["input_tokens"], 1)
+            print(f"{scenario:<11}{result['wall_seconds']:>8}{result['peak_rss_mb']:>8}{result['peak_child_rss_mb']:>10}"
+                  f"{result['claude_requests']:>8}{result['whisper_requests']:>9}{result['upload_mb']:>10}{result['jira_requests']:>6}"
+                  f"{result['jira_connections']:>6}{result['input_tokens']:>11}{cached_share:>7.0f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""A small in-process fake of the Jira REST endpoints Story Slammer uses.
+
+Serves GET /rest/api/2/issue/<key> (with ETag revalidation) and POST /rest/api/2/search
+(with startAt paging, a capped page size and `updated >= -Nm` filtering) over a generated epic, and can inject
+429 responses with Retry-After to exercise the client's backoff.
+
+    python benchmarks/fake_jira.py --port 8099 --children 300
+    JIRA_BASE_URL=http://127.0.0.1:8099 python main.py
+"""
+import argparse
+import calendar
+import hashlib
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+
+def make_issue(key: str, summary: str, parent_key: Optional[str] = None, description: str = "") -> Dict[str, Any]:
+    fields = {
+        "summary": summary,
+        "status": {"name": "In Progress"},
+        "assignee": {"displayName": "Pat Example"},
+        "priority": {"name": "Medium"},
+        "description": description or f"h2. {summary}\n\nAs a user I want *{summary.lower()}* so that -nothing- breaks.",
+        "updated": "2024-01-01T00:00:00.000+0000",
+    }
+    if parent_key:
+        fields["parent"] = {"key": parent_key}
+    return {"key": key, "fields": fields}
+
+
+def make_epic(project: str = "PROJ", children: int = 50) -> Dict[str, Dict[str, Any]]:
+    issues = {f"{project}-1": make_issue(f"{project}-1", "Checkout redesign")}
+    for number in range(2, children + 2):
+        key = f"{project}-{number}"
+        issues[key] = make_issue(key, f"Story number {number}", f"{project}-1")
+    return issues
+
+
+def load_issues(path: str) -> Dict[str, Dict[str, Any]]:
+    """Reads issues saved by backends.recording_jira_client."""
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+class FakeJira:
+    def __init__(self, issues: Dict[str, Dict[str, Any]], max_page_size: int = 50, latency: float = 0.0,
+                 rate_limit_every: int = 0, retry_after: str = "0"):
+        self.issues = issues
+        self.max_page_size = max_page_size
+        self.latency = latency
+        self.rate_limit_every = rate_limit_every
+        self.retry_after = retry_after
+        self.lock = threading.Lock()
+        self.requests: List[str] = []
+        self.connections = 0
+        self.server: Optional[ThreadingHTTPServer] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self, port: int = 0) -> "FakeJira":
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                with fake.lock:
+                    fake.connections += 1
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                fake.handle(self, "GET")
+
+            def do_POST(self):
+                fake.handle(self, "POST")
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def update(self, key: str, **fields: Any) -> None:
+        with self.lock:
+            self.issues[key]["fields"].update(fields)
+            self.issues[key]["fields"]["updated"] = time.strftime("%Y-%m-%dT%H:%M:%S.000+0000", time.gmtime())
+
+    def handle(self, handler: BaseHTTPRequestHandler, method: str) -> None:
+        length = int(handler.headers.get("Content-Length") or 0)
+        body = json.loads(handler.rfile.read(length)) if length else {}
+        with self.lock:
+            self.requests.append(f"{method} {handler.path}")
+            request_number = len(self.requests)
+
+        if self.latency:
+            time.sleep(self.latency)
+
+        if self.rate_limit_every and request_number % self.rate_limit_every == 0:
+            return self.respond(handler, 429, {"errorMessages": ["Rate limit exceeded"]}, {"Retry-After": self.retry_after})
+
+        path = handler.path.split("?")[0]
+        if method == "GET" and path.startswith("/rest/api/2/issue/"):
+            issue = self.issues.get(path.rsplit("/", 1)[-1])
+            if not issue:
+                return self.respond(handler, 404, {"errorMessages": ["Issue does not exist"]})
+            etag = f'"{hashlib.sha1(json.dumps(issue, sort_keys=True).encode()).hexdigest()}"'
+            if handler.headers.get("If-None-Match") == etag:
+                return self.respond(handler, 304, None, {"ETag": etag})
+            return self.respond(handler, 200, issue, {"ETag": etag})
+
+        if method == "POST" and path == "/rest/api/2/search":
+            # Like Jira, a key that does not exist fails the whole query unless validateQuery is "warn"
+            warnings = [f"The issue key '{key}' for field 'key' is invalid." for key in self.unknown_keys(body.get("jql", ""))]
+            if warnings and body.get("validateQuery") != "warn":
+                return self.respond(handler, 400, {"errorMessages": warnings})
+            matches = self.search(body.get("jql", ""))
+            start_at = body.get("startAt", 0)
+            page_size = min(body.get("maxResults", 50), self.max_page_size)
+            page = [self.project(issue, body.get("fields")) for issue in matches[start_at:start_at + page_size]]
+            return self.respond(handler, 200, {"startAt": start_at, "maxResults": page_size, "total": len(matches), "issues": page,
+                                               "warningMessages": warnings})
+
+        self.respond(handler, 404, {"errorMessages": ["Not found"]})
+
+    def search(self, jql: str) -> List[Dict[str, Any]]:
+        # Supports one optional "AND updated >= -<N>m" restriction on top of the key and parent clauses
+        updated_within = None
+        updated_match = re.search(r"\s+AND\s+updated\s*>=\s*-(\d+)m", jql, re.IGNORECASE)
+        if updated_match:
+            updated_within = int(updated_match.group(1)) * 60
+            jql = jql[:updated_match.start()].strip().strip("()")
+
+        keys = set()
+        for match in re.finditer(r"(issue|key|parent)\s*(=|in)\s*\(?([^)]*?)\)?(?=\s+OR\s+|\s+ORDER\s+|$)", jql, re.IGNORECASE):
+            field, values = match.group(1).lower(), [value.strip().strip('"') for value in match.group(3).split(",")]
+            for issue in self.issues.values():
+                if field in ("issue", "key") and issue["key"] in values:
+                    keys.add(issue["key"])
+                elif field == "parent" and issue["fields"].get("parent", {}).get("key") in values:
+                    keys.add(issue["key"])
+        return [issue for key, issue in self.issues.items() if key in keys and
+                (updated_within is None or self.age(issue) <= updated_within)]
+
+    def unknown_keys(self, jql: str) -> List[str]:
+        keys = []
+        for match in re.finditer(r"\b(?:issue|key)\s*(?:=|in)\s*\(?([^)]*?)\)?(?=\s+OR\s+|\s+AND\s+|\s+ORDER\s+|\)|$)", jql, re.IGNORECASE):
+            keys.extend(value.strip().strip('"') for value in match.group(1).split(","))
+        return [key for key in keys if key and key not in self.issues]
+
+    @staticmethod
+    def age(issue: Dict[str, Any]) -> float:
+        updated = time.strptime(issue["fields"]["updated"][:19], "%Y-%m-%dT%H:%M:%S")
+        return time.time() - calendar.timegm(updated)
+
+    @staticmethod
+    def project(issue: Dict[str, Any], fields: Optional[List[str]]) -> Dict[str, Any]:
+        if not fields:
+            return issue
+        return {"key": issue["key"], "fields": {name: value for name, value in issue["fields"].items() if name in fields}}
+
+    @staticmethod
+    def respond(handler: BaseHTTPRequestHandler, status: int, payload: Any, headers: Optional[Dict[str, str]] = None) -> None:
+        data = json.dumps(payload).encode() if payload is not None else b""
+        handler.send_response(status)
+        handler.send_header("Content-Type", "application/json")
+        handler.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            handler.send_header(name, value)
+        handler.end_headers()
+        handler.wfile.write(data)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--children", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds of delay added to every response")
+    parser.add_argument("--rate-limit-every", type=int, default=0, help="Answer every Nth request with 429")
+    parser.add_argument("--issues-file", help="Serve issues recorded with backends.recording_jira_client instead of a generated epic")
+    args = parser.parse_args()
+
+    issues = load_issues(args.issues_file) if args.issues_file else make_epic(children=args.children)
+    fake_jira = FakeJira(issues, latency=args.latency, rate_limit_every=args.rate_limit_every).start(args.port)
+    print(f"Fake Jira listening on {fake_jira.base_url} with {len(issues)} issues")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        fake_jira.stop()
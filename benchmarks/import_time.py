@@ -0,0 +1,57 @@
+"""Measures how long `import main` takes with `python -X importtime` and fails on regressions.
+
+Runs the import in fresh interpreters, reports the best cumulative time and the slowest
+modules, and exits with status 1 when the time is above --threshold-ms or when any of the
+heavy dependencies that must stay lazy is imported eagerly.
+
+    python benchmarks/import_time.py --threshold-ms 150
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LAZY_MODULES = ("numpy", "PIL", "requests", "anthropic", "openai", "moviepy", "tkinter")
+
+
+def measure() -> list:
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"], cwd=REPO_ROOT,
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        sys.exit(f"import main failed:\n{result.stderr}")
+
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((int(self_us), int(cumulative_us), name.rstrip()))
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threshold-ms", type=float, default=150)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    runs = [measure() for _ in range(args.runs)]
+    totals = [next(cumulative for _, cumulative, name in rows if name.strip() == "main") / 1000 for rows in runs]
+    best = min(range(len(runs)), key=lambda index: totals[index])
+
+    print(f"import main: best {totals[best]:.1f} ms, worst {max(totals):.1f} ms over {args.runs} runs (threshold {args.threshold_ms:.0f} ms)")
+    print("Slowest modules by self time:")
+    for self_us, cumulative_us, name in sorted(runs[best], reverse=True)[:10]:
+        print(f"  {self_us / 1000:>7.1f} ms self {cumulative_us / 1000:>7.1f} ms cumulative  {name.strip()}")
+
+    eager = sorted({name.strip().split(".")[0] for _, _, name in runs[best]} & set(LAZY_MODULES))
+    if eager:
+        print(f"FAIL: imported eagerly: {', '.join(eager)}")
+    if totals[best] > args.threshold_ms:
+        print("FAIL: import time is above the threshold")
+    sys.exit(1 if eager or totals[best] > args.threshold_ms else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""Measures how much the Jira markup conversion shrinks the issue data sent to Claude.
+
+Formats a corpus of issues twice, once with descriptions passed through as raw wiki markup
+and once through JiraMarkup, and reports characters, estimated tokens and conversion time.
+The corpus is generated unless --corpus points at a saved Jira search response. With --api
+the tokens are counted by the Anthropic count_tokens endpoint instead of estimated.
+
+    python benchmarks/jira_markup.py --issues 200
+    python benchmarks/jira_markup.py --corpus search.json --api
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SNIPPETS = [
+    "h2. Background\n",
+    "{panel:title=Acceptance criteria|borderStyle=dashed|borderColor=#cccccc|titleBGColor=#f7d6c1|bgColor=#ffffce}\n",
+    "{panel}\n",
+    "{color:#de350b}*Blocked*{color} until PROJ-{number} ships.\n",
+    "As a *shopper* I want to _save my cart_ so that I can come back later.\n",
+    "* Given a logged in user\n** with {{cart.items > 0}}\n*** and a -legacy- session token\n",
+    "# Open the checkout page\n# Click +Pay now+\n",
+    "||Field||Type||Required||\n|email|string|yes|\n|coupon|string|no|\n",
+    "{code:javascript}\nconst total = items.reduce((sum, item) => sum + item.price, 0);\nif (total < 0 && !refund) { throw new Error('negative'); }\n{code}\n",
+    "See !checkout-mock-v3.png|thumbnail,width=300! and [the design doc|https://wiki.example.com/display/PROJ/Checkout+Redesign].\n",
+    "cc [~accountid:5b10a2844c20165700ede21g] [~accountid:5b10ac8d82e05b22cc7d4ef5]\n",
+    "{info}Feature flagged behind checkout_v2.{info}\n",
+    "----\n",
+    "{noformat}\n2024-01-01 12:00:00 ERROR PaymentService   timeout after 30000ms\n{noformat}\n",
+    "{toc:maxLevel=2}\n",
+    "   \n\n\n",
+]
+
+
+def generate_corpus(count: int, seed: int) -> list:
+    rng = random.Random(seed)
+    issues = []
+    for number in range(1, count + 1):
+        parts = [rng.choice(SNIPPETS).replace("{number}", str(rng.randint(1, 999))) for _ in range(rng.randint(4, 40))]
+        issues.append({
+            "key": f"PROJ-{number}",
+            "fields": {
+                "summary": f"Checkout <step {number}> & payment",
+                "status": {"name": "In Progress"},
+                "assignee": {"displayName": "Pat Example"},
+                "priority": {"name": "Medium"},
+                "description": "".join(parts),
+            }
+        })
+    return issues
+
+
+def load_corpus(path: str) -> list:
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return data["issues"] if isinstance(data, dict) else data
+
+
+def raw_issue(issue: dict) -> str:
+    fields = issue["fields"]
+    assignee = fields.get("assignee")
+    return f"""<relatedIssue>
+    <key>{issue['key']}</key>
+    <summary>{fields['summary']}</summary>
+    <status>{fields['status']['name']}</status>
+    <assignee>{assignee['displayName'] if assignee else 'Unassigned'}</assignee>
+    <priority>{(fields.get('priority') or {}).get('name', 'None')}</priority>
+    <description>{fields.get('description') or 'No description provided'}</description>
+</relatedIssue>"""
+
+
+def count_tokens(text: str, use_api: bool) -> int:
+    if not use_api:
+        return len(text) // 4
+    import anthropic
+    import main
+    client = anthropic.Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
+    return client.messages.count_tokens(model=main.CLAUDE_MODEL, messages=[{"role": "user", "content": text}]).input_tokens
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--issues", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--corpus", help="JSON file with a Jira search response or a list of issues")
+    parser.add_argument("--api", action="store_true", help="Count tokens with the Anthropic API instead of estimating them")
+    args = parser.parse_args()
+
+    sys.path.insert(0, REPO_ROOT)
+    os.chdir(REPO_ROOT)
+    import main as story_slammer
+
+    issues = load_corpus(args.corpus) if args.corpus else generate_corpus(args.issues, args.seed)
+
+    raw = "".join(raw_issue(issue) for issue in issues)
+    start = time.perf_counter()
+    converted = "".join(story_slammer.JiraAPI.format_issue(issue, "relatedIssue") for issue in issues)
+    elapsed = time.perf_counter() - start
+
+    raw_tokens, converted_tokens = count_tokens(raw, args.api), count_tokens(converted, args.api)
+    label = "tokens" if args.api else "est. tokens"
+    print(f"{len(issues)} issues, conversion took {elapsed * 1000:.1f} ms ({elapsed * 1e6 / len(issues):.0f} us per issue)")
+    print(f"{'format':<12}{'chars':>12}{label:>14}")
+    print(f"{'raw markup':<12}{len(raw):>12}{raw_tokens:>14}")
+    print(f"{'converted':<12}{len(converted):>12}{converted_tokens:>14}")
+    print(f"Prompt tokens reduced by {100 * (1 - converted_tokens / max(raw_tokens, 1)):.1f}%")
+
+
+if __name__ == "__main__":
+    main()
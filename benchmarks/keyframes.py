@@ -0,0 +1,78 @@
+"""Measures the CPU cost of finding keyframes in a recording.
+
+Generates a screen-share style test video whose content changes every --scene-seconds,
+then compares sampling only the stream's keyframes against decoding every frame, and
+reports CPU seconds (ffmpeg children included), wall time and the scene changes found.
+
+    python benchmarks/keyframes.py --minutes 30
+"""
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def generate_video(path: str, minutes: float, scene_seconds: int, ffmpeg_path: str) -> None:
+    # Every scene_seconds the picture is inverted and its hue jumps, which the extractor should report as a scene change
+    scene = f"floor(t/{scene_seconds})"
+    subprocess.run([
+        ffmpeg_path, "-y", "-loglevel", "error",
+        "-f", "lavfi", "-i", f"testsrc2=size=1280x720:rate=30,hue=H={scene}*1.7,negate=enable='eq(mod({scene},2),1)'",
+        "-t", str(int(minutes * 60)), "-g", "150", "-c:v", "mpeg4", "-q:v", "8", path
+    ], check=True)
+
+
+def cpu_seconds() -> float:
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+
+def measure(extractor, video_path: str, keyframes_only: bool) -> tuple:
+    cpu_start, wall_start = cpu_seconds(), time.perf_counter()
+    samples = extractor.sample_frames(video_path, keyframes_only)
+    changes = extractor.find_scene_changes(samples)
+    return cpu_seconds() - cpu_start, time.perf_counter() - wall_start, len(samples), changes
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--minutes", type=float, default=10)
+    parser.add_argument("--scene-seconds", type=int, default=60)
+    parser.add_argument("--video", help="Use an existing MP4 instead of generating one")
+    args = parser.parse_args()
+
+    sys.path.insert(0, REPO_ROOT)
+    os.chdir(REPO_ROOT)
+    import main as story_slammer
+
+    ffmpeg_path = story_slammer.DataProcessor.find_ffmpeg()
+    if not ffmpeg_path:
+        sys.exit("ffmpeg is required for keyframe extraction.")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        video_path = args.video
+        if not video_path:
+            video_path = os.path.join(temp_dir, "scenes.mp4")
+            print(f"Generating {args.minutes} minute test video with a scene change every {args.scene_seconds}s...")
+            generate_video(video_path, args.minutes, args.scene_seconds, ffmpeg_path)
+
+        extractor = story_slammer.KeyframeExtractor(ffmpeg_path, max_keyframes=story_slammer.KEYFRAME_COUNT)
+        print(f"{'mode':<16}{'CPU s':>8}{'wall s':>8}{'samples':>9}  keyframes")
+        for label, keyframes_only in (("keyframes only", True), ("every frame", False)):
+            cpu, wall, sample_count, changes = measure(extractor, video_path, keyframes_only)
+            stamps = ", ".join(story_slammer.DataProcessor.format_timestamp(change) for change in changes)
+            print(f"{label:<16}{cpu:>8.2f}{wall:>8.2f}{sample_count:>9}  {stamps}")
+
+        cpu_start = cpu_seconds()
+        keyframes = extractor.extract(video_path)
+        print(f"Full extraction of {len(keyframes)} keyframes (sampling, grabbing and encoding): {cpu_seconds() - cpu_start:.2f} CPU s")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,68 @@
+from __future__ import annotations
+
 import json
 import os
+import sys
+import importlib
 import base64
-import tempfile
 import re
-from dataclasses import dataclass, asdict
-from typing import List, Dict, Optional
+import io
+import wave
+import tempfile
+import shutil
+import subprocess
+import hashlib
+import threading
+import time
+import argparse
+import atexit
+import random
+import email.utils
+import html
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, wait, as_completed, FIRST_COMPLETED
+from dataclasses import dataclass, asdict, field, replace
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+from typing import List, Dict, Optional, Iterable, Iterator, Any, Callable, Deque, TYPE_CHECKING
 
-import tkinter as tk
-from tkinter import filedialog
 from colorama import init, Fore, Style
-from moviepy.editor import VideoFileClip
-from openai import OpenAI
 from dotenv import load_dotenv
-import requests
-from requests.auth import HTTPBasicAuth
-import anthropic
+
+if TYPE_CHECKING:
+    import anthropic
+    from moviepy.editor import VideoFileClip
+    from openai import OpenAI
+
+
+class LazyLoader:
+    """Stands in for a module or client and only creates it on first attribute access, so heavy imports
+    (numpy, Pillow, requests, the API SDKs, MoviePy, tkinter) are paid by the features that use them."""
+
+    def __init__(self, factory: Callable[[], Any]):
+        self._factory = factory
+        self._target = None
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name: str) -> Any:
+        if self._target is None:
+            with self._lock:
+                if self._target is None:
+                    self._target = self._factory()
+        return getattr(self._target, name)
+
+    @classmethod
+    def module(cls, name: str) -> LazyLoader:
+        return cls(lambda: importlib.import_module(name))
+
+
+np = LazyLoader.module("numpy")
+Image = LazyLoader.module("PIL.Image")
+ImageOps = LazyLoader.module("PIL.ImageOps")
+features = LazyLoader.module("PIL.features")
+requests = LazyLoader.module("requests")
 
 # Initialize colorama for Windows compatibility
 init()
@@ -22,32 +70,101 @@ init()
 # Load environment variables
 load_dotenv()
 
-# Initialize tkinter
-root = tk.Tk()
-root.withdraw()
-
 # Constants and global variables
 SETTINGS_FILE = "settings.json"
 
-# Read prompt files
-current_dir = os.getcwd()
-summary_path = os.path.join(current_dir, "prompts", "initial_summary_prompt.txt")
-chatbot_path = os.path.join(current_dir, "prompts", "chatbot_prompt.txt")
-context_path = os.path.join(current_dir, "prompts", "context.txt")
-
-with open(summary_path, 'r', encoding='utf-8') as file:
-    initial_summary_prompt = file.read()
-
-with open(chatbot_path, 'r', encoding='utf-8') as file:
-    chatbot_prompt = file.read()
-
-with open(context_path, 'r', encoding='utf-8') as file:
-    context = file.read()
-
-initial_summary_prompt = f"{initial_summary_prompt}\n<context>{context}</context>"
+WHISPER_MODEL = "whisper-1"
+TRANSCRIPTION_SAMPLE_RATE = 16000
+TRANSCRIPTION_WORKERS = 4
+# 10 minutes of 16 kHz mono PCM is ~19 MB, safely under Whisper's 25 MB upload limit
+MAX_CHUNK_SECONDS = 600
+SILENCE_SEARCH_SECONDS = 30
+SILENCE_FRAME_SECONDS = 0.1
+
+# Claude downsizes anything with a longer edge than this, so sending more pixels only costs upload time
+IMAGE_MAX_EDGE = 1568
+IMAGE_QUALITY = 80
+IMAGE_MAX_COUNT = 8
+# Perceptual hashes this many bits apart or closer are treated as the same screenshot
+IMAGE_DUPLICATE_DISTANCE = 6
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.webp')
+
+KEYFRAME_COUNT = 6
+KEYFRAME_THUMBNAIL_SIZE = (64, 36)
+# Mean absolute difference (0-255) between sampled thumbnails that counts as a scene change
+KEYFRAME_SCENE_THRESHOLD = 10.0
+KEYFRAME_MIN_GAP_SECONDS = 10
+KEYFRAME_SAMPLE_SECONDS = 5
+
+CACHE_DIR = ".story_slammer_cache"
+CACHE_INDEX_FILE = "index.json"
+CACHE_MAX_MB = 1024
+
+JIRA_TIMEOUT = (5, 30)
+JIRA_MAX_RETRIES = 5
+JIRA_BACKOFF_SECONDS = 0.5
+JIRA_PAGE_SIZE = 100
+JIRA_POOL_SIZE = 10
+JIRA_RETRY_STATUSES = (429, 500, 502, 503, 504)
+JIRA_KEYS_PER_QUERY = 50
+# Responses kept for If-None-Match revalidation; the least recently used are dropped first
+JIRA_ETAG_MAX_ENTRIES = 1000
+# Longer descriptions are cut to roughly this many tokens (about 4 characters each) before they go into the prompt
+JIRA_DESCRIPTION_MAX_TOKENS = 1500
+
+CLAUDE_MODEL = "claude-3-5-sonnet-20240620"
+CLAUDE_TEMPERATURE = 0.6
+# Requests above this many input tokens are reported before they are sent
+CONTEXT_TOKEN_BUDGET = 180000
+CACHE_CONTROL = {"type": "ephemeral"}
+# USD per million tokens for CLAUDE_MODEL and per minute of Whisper audio, used for cost estimates in the run summary
+CLAUDE_PRICE_PER_MTOK = {"input_tokens": 3.00, "cache_write_tokens": 3.75, "cache_read_tokens": 0.30, "output_tokens": 15.00}
+WHISPER_PRICE_PER_MINUTE = 0.006
+
+# Spans kept in memory for the trace and the run summary; older ones are dropped first
+TRACE_MAX_SPANS = 200000
+
+# Recent Q&A turns are kept verbatim up to this estimated size; older turns are folded into a rolling summary
+HISTORY_TOKEN_BUDGET = 12000
+HISTORY_KEEP_TURNS = 4
+HISTORY_SUMMARY_MAX_TOKENS = 800
+IMAGE_TOKEN_ESTIMATE = 1600
+ISSUE_KEY_PATTERN = re.compile(r"<key>([A-Z][A-Z0-9_]*-\d+)</key>")
+
+TOOL_MAX_STEPS = 5
+
+SERVICE_HOST = "127.0.0.1"
+SERVICE_PORT = 8765
+SESSION_IDLE_SECONDS = 1800
+SERVICE_TRANSCRIPTION_JOBS = 2
+# Cards are used in vault note paths, so the service only accepts plain Jira keys
+CARD_KEY_PATTERN = re.compile(r"[A-Z][A-Z0-9_]*-\d+")
+
+BATCH_CONCURRENCY = 4
+BATCH_CHECKPOINT_PREFIX = ".story_slammer_batch_"
+
+MANIFEST_SUFFIX = ".manifest.json"
+# Extra minutes added to the `updated >=` window to absorb clock skew between this machine and Jira
+REFRESH_MARGIN_MINUTES = 5
+
+VAULT_INDEX_DIR = ".story_slammer_index"
+VAULT_TRANSCRIPT_DIR = "transcripts"
+INDEX_PASSAGE_WORDS = 200
+INDEX_SEARCH_RESULTS = 5
+INDEX_SEARCH_MAX_RESULTS = 20
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Codec used for uploaded chunks when ffmpeg is available: "flac" (lossless, ~half of WAV) or "opus" (~24 kbps)
+CHUNK_CODEC = "flac"
+CHUNK_CODECS = {
+    "flac": (["-c:a", "flac", "-f", "flac"], "flac"),
+    "opus": (["-c:a", "libopus", "-b:a", "24k", "-f", "ogg"], "ogg"),
+}
 
 chatbot_system_prompt = "You are the world's greatest Engineer at a digital marketing company."
 initial_summary_system_prompt = "You are the world's greatest software architect at a digital marketing company."
+history_summary_system_prompt = "You condense conversations into short, factual summaries without losing any decisions or Jira card keys."
 
 jira_tool = {
     "name": "Jira",
@@ -64,6 +181,27 @@ jira_tool = {
     }
 }
 
+vault_search_tool = {
+    "name": "SearchVault",
+    "description": "Searches the summaries and meeting transcripts of earlier Jira cards in the local vault and returns the most relevant passages with the note they come from. Use it for questions about past work, such as whether a problem has come up before, without fetching cards from Jira.",
+    "input_schema": {
+        "type": "object",
+        "properties": {
+            "query": {
+                "type": "string",
+                "description": "Keywords describing what to look for, such as error messages, components or Jira card keys."
+            },
+            "max_results": {
+                "type": "integer",
+                "minimum": 1,
+                "maximum": INDEX_SEARCH_MAX_RESULTS,
+                "description": f"How many passages to return, {INDEX_SEARCH_RESULTS} by default and at most {INDEX_SEARCH_MAX_RESULTS}."
+            }
+        },
+        "required": ["query"]
+    }
+}
+
 art = """
  _____ __  __       __                __ __  
 (_  | /  \\|__)\\_/  (_ |   /\\ |\\/||\\/||_ |__) 
@@ -76,16 +214,183 @@ class Config:
     images_path: str = ""
     recording_path: str = ""
     vault_path: str = ""
+    transcription_workers: int = TRANSCRIPTION_WORKERS
+    max_images: int = IMAGE_MAX_COUNT
+    extract_keyframes: bool = False
+    max_keyframes: int = KEYFRAME_COUNT
+    cache_max_mb: int = CACHE_MAX_MB
+    batch_concurrency: int = BATCH_CONCURRENCY
+    tool_max_steps: int = TOOL_MAX_STEPS
+
+@dataclass
+class AudioChunk:
+    index: int
+    start: float
+    end: float
+    data: bytes
+    filename: str
+
+@dataclass
+class IngestionResult:
+    name: str
+    value: Any
+    seconds: float
+    error: Optional[str] = None
+
+@dataclass
+class TurnUsage:
+    counted_input_tokens: Optional[int]
+    input_tokens: int
+    cache_read_tokens: int
+    cache_write_tokens: int
+    output_tokens: int
+    seconds: float
+    time_to_first_token: Optional[float] = None
+
+@dataclass
+class Span:
+    name: str
+    category: str
+    start: float
+    seconds: float
+    thread_id: int
+    thread_name: str
+    args: Dict[str, Any]
+
+@dataclass
+class SummaryManifest:
+    card: str
+    parent_key: str
+    # Jira `updated` timestamp of every issue the summary was written from
+    issues: Dict[str, str]
+    # Content hashes of the notes, images and recording the summary was written from
+    inputs: Dict[str, str]
+    prompt_hash: str
+    checked_at: float
+
+@dataclass
+class ChatSession:
+    session_id: str
+    card: str
+    assistant: AIAssistant
+    history: ConversationHistory
+    last_used: float
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+@dataclass
+class TranscriptSegment:
+    start: float
+    end: float
+    text: str
 
 class ColorPrinter:
     @staticmethod
     def print(text: str, color: str = Fore.WHITE) -> None:
         print(f"{color}{text}{Style.RESET_ALL}")
 
+    @staticmethod
+    def write(text: str, color: str = Fore.WHITE) -> None:
+        sys.stdout.write(f"{color}{text}{Style.RESET_ALL}")
+        sys.stdout.flush()
+
     @staticmethod
     def input(prompt: str, color: str = Fore.YELLOW) -> str:
         return input(f"{color}{prompt}{Style.RESET_ALL}")
 
+class Tracer:
+    """Records a timed span for every stage of a run (ingestion sources, Whisper uploads, Jira requests,
+    Claude calls, tools) with its byte, token, retry and cost counters. The spans can be exported as a
+    Chrome trace (chrome://tracing or ui.perfetto.dev) and are aggregated into a summary table."""
+    spans: Deque[Span] = deque(maxlen=TRACE_MAX_SPANS)
+    lock = threading.Lock()
+    origin = time.perf_counter()
+
+    # Counters that are summed per stage in the summary table
+    counters = ("bytes_sent", "bytes_received", "input_tokens", "cache_read_tokens", "cache_write_tokens",
+                "output_tokens", "retries", "cost_usd")
+
+    @staticmethod
+    @contextmanager
+    def span(name: str, category: str, **args: Any) -> Iterator[Dict[str, Any]]:
+        """Times the enclosed block. The yielded dict is recorded as the span's args, so counters known
+        only at the end of the block can be added to it."""
+        start = time.perf_counter()
+        try:
+            yield args
+        except BaseException as e:
+            args["error"] = type(e).__name__
+            raise
+        finally:
+            thread = threading.current_thread()
+            span = Span(name, category, start - Tracer.origin, time.perf_counter() - start, thread.ident or 0, thread.name, args)
+            with Tracer.lock:
+                Tracer.spans.append(span)
+
+    @staticmethod
+    def export(file_path: str) -> None:
+        with Tracer.lock:
+            spans = list(Tracer.spans)
+        pid = os.getpid()
+        events = [{"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": thread_name}}
+                  for tid, thread_name in {(span.thread_id, span.thread_name) for span in spans}]
+        events.extend({
+            "name": span.name,
+            "cat": span.category,
+            "ph": "X",
+            "ts": round(span.start * 1e6),
+            "dur": round(span.seconds * 1e6),
+            "pid": pid,
+            "tid": span.thread_id,
+            "args": span.args
+        } for span in spans)
+        with open(file_path, 'w', encoding='utf-8') as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f, default=str)
+        ColorPrinter.print(f"Wrote {len(spans)} spans to {file_path}", Fore.BLUE)
+
+    @staticmethod
+    def summary() -> List[Dict[str, Any]]:
+        with Tracer.lock:
+            spans = list(Tracer.spans)
+        stages: Dict[str, Dict[str, Any]] = {}
+        for span in spans:
+            stage = stages.setdefault(span.name, {"stage": span.name, "calls": 0, "errors": 0, "seconds": 0.0, "max_seconds": 0.0,
+                                                  **{counter: 0 for counter in Tracer.counters}})
+            stage["calls"] += 1
+            stage["errors"] += "error" in span.args
+            stage["seconds"] += span.seconds
+            stage["max_seconds"] = max(stage["max_seconds"], span.seconds)
+            for counter in Tracer.counters:
+                stage[counter] += span.args.get(counter) or 0
+        return sorted(stages.values(), key=lambda stage: stage["seconds"], reverse=True)
+
+    @staticmethod
+    def print_summary() -> None:
+        stages = Tracer.summary()
+        if not stages:
+            return
+        ColorPrinter.print(f"\n{'stage':<28}{'calls':>7}{'total s':>10}{'mean s':>9}{'max s':>9}  details", Fore.BLUE)
+        for stage in stages:
+            details = []
+            if stage["bytes_sent"] or stage["bytes_received"]:
+                details.append(f"{Tracer.format_bytes(stage['bytes_sent'])} up, {Tracer.format_bytes(stage['bytes_received'])} down")
+            if stage["input_tokens"] or stage["output_tokens"] or stage["cache_read_tokens"]:
+                details.append(f"{stage['input_tokens']} in, {stage['cache_read_tokens']} cached, "
+                               f"{stage['cache_write_tokens']} cache writes, {stage['output_tokens']} out tokens")
+            if stage["retries"]:
+                details.append(f"{stage['retries']} retries")
+            if stage["errors"]:
+                details.append(f"{stage['errors']} errors")
+            if stage["cost_usd"]:
+                details.append(f"${stage['cost_usd']:.4f}")
+            ColorPrinter.print(f"{stage['stage'][:27]:<28}{stage['calls']:>7}{stage['seconds']:>10.2f}{stage['seconds'] / stage['calls']:>9.2f}"
+                               f"{stage['max_seconds']:>9.2f}  {'; '.join(details)}", Fore.BLUE)
+        total_cost = sum(stage["cost_usd"] for stage in stages)
+        ColorPrinter.print(f"Wall time {time.perf_counter() - Tracer.origin:.1f}s, estimated cost ${total_cost:.4f}", Fore.BLUE)
+
+    @staticmethod
+    def format_bytes(size: float) -> str:
+        return f"{size / 1e6:.2f} MB" if size >= 1e6 else f"{size / 1e3:.1f} KB"
+
 class FileHandler:
     @staticmethod
     def load_config(filename: str) -> Config:
@@ -104,9 +409,199 @@ class FileHandler:
         with open(filepath, 'r', encoding='utf-8') as file:
             return file.read()
 
+    @staticmethod
+    def write_streamed(filepath: str, generate: Callable[[Callable[[str], None]], str], on_text: Optional[Callable[[str], None]] = None) -> str:
+        """Calls generate with a callback that appends each text delta to a temporary file next to filepath and
+        passes it on to on_text. The file replaces filepath once generate returns, so a failed or interrupted
+        generation never truncates the previous version."""
+        temp_path = f"{filepath}.tmp"
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as file:
+                def write(text: str) -> None:
+                    file.write(text)
+                    file.flush()
+                    if on_text:
+                        on_text(text)
+
+                result = generate(write)
+            os.replace(temp_path, filepath)
+            return result
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+class PromptLibrary:
+    """Reads the prompt files on first use instead of at import time."""
+    prompts: Dict[str, str] = {}
+
+    @staticmethod
+    def read(file_name: str, required: bool = True) -> str:
+        if file_name not in PromptLibrary.prompts:
+            file_path = os.path.join(os.getcwd(), "prompts", file_name)
+            if not required and not os.path.exists(file_path):
+                PromptLibrary.prompts[file_name] = ""
+            else:
+                PromptLibrary.prompts[file_name] = FileHandler.read_file(file_path)
+        return PromptLibrary.prompts[file_name]
+
+    @staticmethod
+    def context() -> str:
+        return PromptLibrary.read("context.txt", required=False)
+
+    @staticmethod
+    def chatbot() -> str:
+        return PromptLibrary.read("chatbot_prompt.txt")
+
+    @staticmethod
+    def initial_summary() -> str:
+        return f"{PromptLibrary.read('initial_summary_prompt.txt')}\n<context>{PromptLibrary.context()}</context>"
+
+class ContentCache:
+    """Persistent on-disk cache of JSON values keyed by content hashes, with size-bounded LRU eviction."""
+
+    def __init__(self, directory: str = CACHE_DIR, max_mb: int = CACHE_MAX_MB):
+        self.directory = directory
+        self.max_bytes = max_mb * 1024 * 1024
+        self.index_path = os.path.join(directory, CACHE_INDEX_FILE)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.dirty = False
+        os.makedirs(directory, exist_ok=True)
+        self.index = self.load_index()
+        # Hits and access times only touch memory; they reach disk with the next set or clear, or at exit
+        atexit.register(self.flush)
+
+    def load_index(self) -> Dict[str, Any]:
+        if os.path.exists(self.index_path):
+            try:
+                with open(self.index_path, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+            except (OSError, ValueError):
+                ColorPrinter.print("Warning: The cache index is unreadable and will be rebuilt.", Fore.YELLOW)
+        return {"entries": {}, "hits": 0, "misses": 0}
+
+    def save_index(self) -> None:
+        temp_path = f"{self.index_path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.index, f)
+        os.replace(temp_path, self.index_path)
+        self.dirty = False
+
+    def flush(self) -> None:
+        with self.lock:
+            if self.dirty:
+                self.save_index()
+
+    @staticmethod
+    def hash_file(filepath: str) -> str:
+        digest = hashlib.sha256()
+        with open(filepath, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    @staticmethod
+    def make_key(namespace: str, *parts: str) -> str:
+        return f"{namespace}/{hashlib.sha256('|'.join(parts).encode('utf-8')).hexdigest()}"
+
+    def entry_path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, namespace: str, *parts: str) -> Optional[Any]:
+        key = self.make_key(namespace, *parts)
+        with self.lock:
+            entry = self.index["entries"].get(key)
+            if entry is not None:
+                try:
+                    with open(self.entry_path(key), 'r', encoding='utf-8') as f:
+                        value = json.load(f)
+                    entry["last_access"] = time.time()
+                    self.hits += 1
+                    self.index["hits"] += 1
+                    self.dirty = True
+                    return value
+                except (OSError, ValueError):
+                    del self.index["entries"][key]
+            self.misses += 1
+            self.index["misses"] += 1
+            self.dirty = True
+            return None
+
+    def set(self, namespace: str, parts: Iterable[str], value: Any) -> None:
+        key = self.make_key(namespace, *parts)
+        data = json.dumps(value).encode('utf-8')
+        with self.lock:
+            path = self.entry_path(key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as f:
+                f.write(data)
+            self.index["entries"][key] = {"size": len(data), "last_access": time.time()}
+            self.evict()
+            self.save_index()
+
+    def get_or_compute(self, namespace: str, parts: Iterable[str], compute: Callable[[], Any]) -> Any:
+        parts = list(parts)
+        value = self.get(namespace, *parts)
+        if value is None:
+            value = compute()
+            self.set(namespace, parts, value)
+        return value
+
+    def evict(self) -> None:
+        entries = self.index["entries"]
+        total = sum(entry["size"] for entry in entries.values())
+        for key in sorted(entries, key=lambda k: entries[k]["last_access"]):
+            if total <= self.max_bytes:
+                break
+            total -= entries.pop(key)["size"]
+            try:
+                os.remove(self.entry_path(key))
+            except OSError:
+                pass
+
+    def clear(self, namespace: Optional[str] = None) -> int:
+        with self.lock:
+            keys = [key for key in self.index["entries"] if namespace is None or key.startswith(f"{namespace}/")]
+            for key in keys:
+                del self.index["entries"][key]
+                try:
+                    os.remove(self.entry_path(key))
+                except OSError:
+                    pass
+            self.save_index()
+            return len(keys)
+
+    def describe(self) -> str:
+        entries = self.index["entries"]
+        size_mb = sum(entry["size"] for entry in entries.values()) / (1024 * 1024)
+        return (f"{len(entries)} entries, {size_mb:.1f} MB of {self.max_bytes // (1024 * 1024)} MB, "
+                f"{self.index['hits']} hits / {self.index['misses']} misses overall")
+
 class PathSelector:
+    root = None
+
+    @staticmethod
+    def has_display() -> bool:
+        if sys.platform.startswith("linux") and not (os.getenv("DISPLAY") or os.getenv("WAYLAND_DISPLAY")):
+            return False
+        try:
+            import tkinter
+        except ImportError:
+            return False
+        return True
+
     @staticmethod
     def get_file_path(title: str, file_type: str) -> str:
+        if not PathSelector.has_display():
+            return PathSelector.get_typed_path(file_type)
+
+        import tkinter as tk
+        from tkinter import filedialog
+        if PathSelector.root is None:
+            PathSelector.root = tk.Tk()
+            PathSelector.root.withdraw()
+
         if file_type == "folder":
             return filedialog.askdirectory(title=title)
         elif file_type == "markdown file":
@@ -116,6 +611,13 @@ class PathSelector:
         else:
             return filedialog.askopenfilename(title=title)
 
+    @staticmethod
+    def get_typed_path(file_type: str) -> str:
+        while True:
+            path = os.path.expanduser(ColorPrinter.input(f"Enter the path of the {file_type} (leave empty to keep the current value): ").strip().strip('"'))
+            if not path or PathSelector.validate_file_path(path, file_type):
+                return path
+
     @staticmethod
     def validate_file_path(path: str, file_type: str) -> bool:
         if not path:
@@ -136,139 +638,745 @@ class PathSelector:
 
 class DataProcessor:
     @staticmethod
-    def get_image_data(image_folder_path: str) -> List[Dict[str, str]]:
+    def get_image_data(image_folder_path: str, cache: Optional[ContentCache] = None, max_images: int = IMAGE_MAX_COUNT) -> List[Dict[str, str]]:
         if not os.path.isdir(image_folder_path):
             raise ValueError(f"Error: '{image_folder_path}' is not a valid directory.")
 
-        image_files = [f for f in os.listdir(image_folder_path) if os.path.isfile(os.path.join(image_folder_path, f))]
+        image_files = []
+        for file in sorted(os.listdir(image_folder_path)):
+            file_path = os.path.join(image_folder_path, file)
+            if not os.path.isfile(file_path):
+                continue
+            if os.path.splitext(file)[1].lower() not in IMAGE_EXTENSIONS:
+                ColorPrinter.print(f"Skipping '{file}': only JPEG, PNG, GIF and WebP images are supported.", Fore.YELLOW)
+                continue
+            image_files.append(file_path)
+
+        records: Dict[str, Dict[str, Any]] = {}
+        uncached: Dict[str, List[str]] = {}
+        for file_path in image_files:
+            parts = [ContentCache.hash_file(file_path), str(IMAGE_MAX_EDGE), str(IMAGE_QUALITY)] if cache else []
+            cached = cache.get("image", *parts) if cache else None
+            if cached is not None:
+                records[file_path] = cached
+            else:
+                uncached[file_path] = parts
+
+        # Threads rather than processes: this runs inside the ingestion worker threads, where forking is unsafe,
+        # and Pillow releases the GIL while decoding, resizing and encoding
+        with ThreadPoolExecutor(max_workers=max(min(len(uncached), os.cpu_count() or 1), 1)) as executor:
+            futures = {executor.submit(ImageProcessor.process_file, file_path): file_path for file_path in uncached}
+            for future in as_completed(futures):
+                file_path = futures[future]
+                try:
+                    record = future.result()
+                except Exception as e:
+                    ColorPrinter.print(f"Skipping '{os.path.basename(file_path)}': {e}", Fore.YELLOW)
+                    continue
+                if cache:
+                    cache.set("image", uncached[file_path], record)
+                records[file_path] = record
+
+        selected = ImageProcessor.select([records[file_path] for file_path in image_files if file_path in records], max_images)
+        original_bytes = sum(record["original_bytes"] for record in records.values())
+        sent_bytes = sum(record["bytes"] for record in selected)
+        ColorPrinter.print(f"Images: {len(selected)} of {len(records)} selected, "
+                           f"{original_bytes / 1e6:.1f} MB on disk -> {sent_bytes / 1e6:.2f} MB sent "
+                           f"({max(original_bytes - sent_bytes, 0) / 1e6:.1f} MB saved)", Fore.CYAN)
+        return [record["source"] for record in selected]
 
-        if len(image_files) > 4:
-            raise ValueError("Error: The image folder contains more than 4 files.")
+    @staticmethod
+    def get_transcript_data(recording_file_path: str, whisper: OpenAI, max_workers: int = TRANSCRIPTION_WORKERS,
+                            cache: Optional[ContentCache] = None) -> str:
+        segments = DataProcessor.get_cached_transcript_segments(recording_file_path, whisper, max_workers, cache)
+        return "\n".join(f"[{DataProcessor.format_timestamp(segment.start)}] {segment.text}" for segment in segments)
 
-        valid_extensions = ('.jpg', '.jpeg', '.png', '.gif', '.webp')
-        processed_images = []
+    @staticmethod
+    def get_cached_transcript_segments(recording_file_path: str, whisper: OpenAI, max_workers: int = TRANSCRIPTION_WORKERS,
+                                       cache: Optional[ContentCache] = None) -> List[TranscriptSegment]:
+        if not cache or not os.path.isfile(recording_file_path):
+            return DataProcessor.get_transcript_segments(recording_file_path, whisper, max_workers)
 
-        for file in image_files:
-            file_path = os.path.join(image_folder_path, file)
-            file_extension = os.path.splitext(file)[1].lower()
-            
-            if file_extension not in valid_extensions:
-                raise ValueError(f"Error: '{file}' is not a valid image format. Allowed formats are JPEG, PNG, GIF, and WebP.")
-            
-            with open(file_path, "rb") as image_file:
-                encoded_string = base64.b64encode(image_file.read()).decode('utf-8')
-            
-            media_type = f"image/{file_extension[1:]}"
-            if media_type == "image/jpg":
-                media_type = "image/jpeg"
-            
-            processed_images.append({
-                "type": "base64",
-                "media_type": media_type,
-                "data": encoded_string,
-            })
+        parts = [ContentCache.hash_file(recording_file_path), WHISPER_MODEL]
+        cached = cache.get("transcript", *parts)
+        if cached is not None:
+            ColorPrinter.print("Using cached transcript for this recording.", Fore.CYAN)
+            return [TranscriptSegment(**segment) for segment in cached]
 
-        return processed_images
+        segments = DataProcessor.get_transcript_segments(recording_file_path, whisper, max_workers)
+        cache.set("transcript", parts, [asdict(segment) for segment in segments])
+        return segments
 
     @staticmethod
-    def get_transcript_data(recording_file_path: str, whisper: OpenAI) -> str:
+    def get_transcript_segments(recording_file_path: str, whisper: OpenAI, max_workers: int = TRANSCRIPTION_WORKERS) -> List[TranscriptSegment]:
         if not os.path.isfile(recording_file_path):
             raise ValueError(f"Error: '{recording_file_path}' is not a valid file.")
 
-        temp_audio = None
-        audio_file = None
+        ffmpeg_path = DataProcessor.find_ffmpeg()
+        video = None
 
         try:
-            temp_audio = tempfile.NamedTemporaryFile(suffix=".mp3", delete=False)
-            temp_audio_path = temp_audio.name
-            temp_audio.close()
-
             ColorPrinter.print("Extracting audio from the video...", Fore.CYAN)
-            video = VideoFileClip(recording_file_path)
-            video.audio.write_audiofile(temp_audio_path, codec='mp3')
-            video.close()
+            if ffmpeg_path:
+                blocks = DataProcessor.stream_audio_blocks(recording_file_path, ffmpeg_path)
+                chunker = AudioChunker(ffmpeg_path=ffmpeg_path, codec=CHUNK_CODEC)
+            else:
+                ColorPrinter.print("ffmpeg not found, falling back to MoviePy for audio extraction.", Fore.YELLOW)
+                from moviepy.editor import VideoFileClip
+                video = VideoFileClip(recording_file_path)
+                blocks = DataProcessor.read_audio_blocks(video)
+                chunker = AudioChunker()
+
+            ColorPrinter.print(f"Transcribing the audio with {max_workers} workers...", Fore.CYAN)
+            return DataProcessor.transcribe_chunks(chunker.split(blocks), whisper, max_workers)
+
+        except Exception as e:
+            raise RuntimeError(f"Error during transcription: {str(e)}")
+
+        finally:
+            if video:
+                video.close()
+
+    @staticmethod
+    def get_keyframe_data(recording_file_path: str, max_keyframes: int = KEYFRAME_COUNT, cache: Optional[ContentCache] = None) -> List[Dict[str, Any]]:
+        if not os.path.isfile(recording_file_path):
+            raise ValueError(f"Error: '{recording_file_path}' is not a valid file.")
+
+        ffmpeg_path = DataProcessor.find_ffmpeg()
+        if not ffmpeg_path:
+            raise RuntimeError("Keyframe extraction requires ffmpeg.")
+
+        extractor = KeyframeExtractor(ffmpeg_path, max_keyframes)
+        if not cache:
+            keyframes = extractor.extract(recording_file_path)
+        else:
+            parts = [ContentCache.hash_file(recording_file_path), str(max_keyframes), str(KEYFRAME_SCENE_THRESHOLD), str(IMAGE_MAX_EDGE)]
+            keyframes = cache.get_or_compute("keyframes", parts, lambda: extractor.extract(recording_file_path))
+        ColorPrinter.print(f"Keyframes: {len(keyframes)} scene changes selected ({sum(k['bytes'] for k in keyframes) / 1e6:.2f} MB)", Fore.CYAN)
+        return keyframes
+
+    @staticmethod
+    def find_ffmpeg() -> Optional[str]:
+        ffmpeg_path = shutil.which("ffmpeg")
+        if ffmpeg_path:
+            return ffmpeg_path
+        try:
+            # MoviePy ships its own ffmpeg binary through imageio-ffmpeg
+            import imageio_ffmpeg
+            return imageio_ffmpeg.get_ffmpeg_exe()
+        except Exception:
+            return None
+
+    @staticmethod
+    def stream_audio_blocks(recording_file_path: str, ffmpeg_path: str, block_seconds: int = 10) -> Iterator[np.ndarray]:
+        """Pipes the audio track out of ffmpeg as 16 kHz mono PCM without decoding any video frames."""
+        command = [
+            ffmpeg_path, "-nostdin", "-loglevel", "error",
+            "-vn", "-i", recording_file_path,
+            "-ac", "1", "-ar", str(TRANSCRIPTION_SAMPLE_RATE),
+            "-f", "s16le", "pipe:1"
+        ]
+        block_bytes = TRANSCRIPTION_SAMPLE_RATE * block_seconds * 2
+        # stderr goes to a temporary file so a chatty ffmpeg can never block on a full pipe
+        with tempfile.TemporaryFile() as log:
+            process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=log)
+            try:
+                while True:
+                    data = process.stdout.read(block_bytes)
+                    if not data:
+                        break
+                    yield np.frombuffer(data[:len(data) - len(data) % 2], dtype=np.int16)
+
+                if process.wait() != 0:
+                    log.seek(0)
+                    raise RuntimeError(f"ffmpeg failed: {log.read().decode('utf-8', errors='replace').strip()}")
+            finally:
+                if process.poll() is None:
+                    process.kill()
+                    process.wait()
+                process.stdout.close()
+
+    @staticmethod
+    def read_audio_blocks(video: VideoFileClip) -> Iterator[np.ndarray]:
+        if video.audio is None:
+            raise ValueError("The recording has no audio track.")
 
-            ColorPrinter.print("Transcribing the audio...", Fore.CYAN)
-            audio_file = open(temp_audio_path, "rb")
+        for block in video.audio.iter_chunks(chunksize=TRANSCRIPTION_SAMPLE_RATE * 10, fps=TRANSCRIPTION_SAMPLE_RATE, quantize=True, nbytes=2):
+            block = np.asarray(block)
+            if block.ndim > 1:
+                block = block.mean(axis=1)
+            yield block.astype(np.int16)
 
+    @staticmethod
+    def transcribe_chunks(chunks: Iterable[AudioChunk], whisper: OpenAI, max_workers: int = TRANSCRIPTION_WORKERS) -> List[TranscriptSegment]:
+        futures = []
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for chunk in chunks:
+                # Keep at most two chunks per worker in memory while the rest of the audio is still being read
+                in_flight = [future for future in futures if not future.done()]
+                if len(in_flight) >= max_workers * 2:
+                    wait(in_flight, return_when=FIRST_COMPLETED)
+                futures.append(executor.submit(DataProcessor.transcribe_chunk, chunk, whisper))
+
+            segments = []
+            for future in futures:
+                segments.extend(future.result())
+            return segments
+
+    @staticmethod
+    def transcribe_chunk(chunk: AudioChunk, whisper: OpenAI) -> List[TranscriptSegment]:
+        audio_seconds = chunk.end - chunk.start
+        with Tracer.span("whisper.transcribe", "whisper", chunk=chunk.index, audio_seconds=round(audio_seconds, 1), bytes_sent=len(chunk.data),
+                         cost_usd=audio_seconds / 60 * WHISPER_PRICE_PER_MINUTE):
             transcript = whisper.audio.transcriptions.create(
-                model="whisper-1",
-                file=audio_file
+                model=WHISPER_MODEL,
+                file=(chunk.filename, chunk.data),
+                response_format="verbose_json"
             )
+        ColorPrinter.print(f"Transcribed chunk {chunk.index + 1} ({DataProcessor.format_timestamp(chunk.start)} - {DataProcessor.format_timestamp(chunk.end)})", Fore.CYAN)
 
-            return transcript.text
+        segments = getattr(transcript, "segments", None)
+        if not segments:
+            return [TranscriptSegment(chunk.start, chunk.end, transcript.text.strip())]
+        return [TranscriptSegment(chunk.start + segment.start, chunk.start + segment.end, segment.text.strip()) for segment in segments]
 
-        except Exception as e:
-            raise RuntimeError(f"Error during transcription: {str(e)}")
+    @staticmethod
+    def format_timestamp(seconds: float) -> str:
+        seconds = int(seconds)
+        return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
 
-        finally:
-            if audio_file:
-                audio_file.close()
-            if temp_audio:
-                temp_audio.close()
-            if os.path.exists(temp_audio_path):
+class ImageProcessor:
+    """Downscales and recompresses images for the model and scores them so the most informative,
+    non-duplicate images can be selected from folders of any size."""
+
+    @staticmethod
+    def process_file(file_path: str) -> Dict[str, Any]:
+        with open(file_path, "rb") as image_file:
+            data = image_file.read()
+        record = ImageProcessor.process_bytes(data, os.path.splitext(file_path)[1].lower())
+        record["name"] = os.path.basename(file_path)
+        return record
+
+    @staticmethod
+    def process_bytes(data: bytes, file_extension: str = "") -> Dict[str, Any]:
+        with Image.open(io.BytesIO(data)) as opened:
+            image = ImageOps.exif_transpose(opened)
+            image.load()
+
+        has_alpha = image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info)
+        image = image.convert("RGBA" if has_alpha else "RGB")
+        resized = max(image.size) > IMAGE_MAX_EDGE
+        if resized:
+            image.thumbnail((IMAGE_MAX_EDGE, IMAGE_MAX_EDGE), Image.LANCZOS)
+
+        encoded, media_type = ImageProcessor.encode(image, has_alpha)
+        if not resized and file_extension in IMAGE_EXTENSIONS and len(data) <= len(encoded):
+            encoded = data
+            media_type = "image/jpeg" if file_extension in (".jpg", ".jpeg") else f"image/{file_extension[1:]}"
+
+        grayscale = image.convert("L")
+        return {
+            "name": "",
+            "source": {
+                "type": "base64",
+                "media_type": media_type,
+                "data": base64.b64encode(encoded).decode('utf-8'),
+            },
+            "hash": ImageProcessor.difference_hash(grayscale),
+            "score": grayscale.entropy(),
+            "original_bytes": len(data),
+            "bytes": len(encoded),
+        }
+
+    @staticmethod
+    def encode(image: Image.Image, has_alpha: bool) -> tuple:
+        buffer = io.BytesIO()
+        if features.check("webp"):
+            image.save(buffer, format="WEBP", quality=IMAGE_QUALITY, method=4)
+            return buffer.getvalue(), "image/webp"
+        if has_alpha:
+            image.save(buffer, format="PNG", optimize=True)
+            return buffer.getvalue(), "image/png"
+        image.save(buffer, format="JPEG", quality=IMAGE_QUALITY, optimize=True)
+        return buffer.getvalue(), "image/jpeg"
+
+    @staticmethod
+    def difference_hash(grayscale: Image.Image) -> str:
+        pixels = np.asarray(grayscale.resize((9, 8), Image.BILINEAR), dtype=np.int16)
+        bits = (pixels[:, 1:] > pixels[:, :-1]).flatten()
+        return f"{int(''.join('1' if bit else '0' for bit in bits), 2):016x}"
+
+    @staticmethod
+    def hash_distance(first: str, second: str) -> int:
+        return bin(int(first, 16) ^ int(second, 16)).count("1")
+
+    @staticmethod
+    def select(records: List[Dict[str, Any]], max_images: int) -> List[Dict[str, Any]]:
+        """Keeps the highest scoring image of every group of near-identical ones, then the max_images
+        highest scoring of those, returned in their original order."""
+        kept: List[Dict[str, Any]] = []
+        for record in sorted(records, key=lambda r: r["score"], reverse=True):
+            if any(ImageProcessor.hash_distance(record["hash"], other["hash"]) <= IMAGE_DUPLICATE_DISTANCE for other in kept):
+                continue
+            kept.append(record)
+
+        selected = kept[:max_images]
+        return [record for record in records if any(record is chosen for chosen in selected)]
+
+class KeyframeExtractor:
+    """Finds scene changes in a recording by comparing tiny grayscale thumbnails of sampled frames.
+    Only the video's own keyframes are decoded (-skip_frame nokey), so a screen recording costs a
+    fraction of a full decode; full resolution frames are then grabbed only for the chosen times."""
+
+    def __init__(self, ffmpeg_path: str, max_keyframes: int = KEYFRAME_COUNT, threshold: float = KEYFRAME_SCENE_THRESHOLD,
+                 min_gap_seconds: float = KEYFRAME_MIN_GAP_SECONDS):
+        self.ffmpeg_path = ffmpeg_path
+        self.max_keyframes = max_keyframes
+        self.threshold = threshold
+        self.min_gap_seconds = min_gap_seconds
+
+    def extract(self, recording_file_path: str) -> List[Dict[str, Any]]:
+        samples = self.sample_frames(recording_file_path, keyframes_only=True)
+        if len(samples) < 3:
+            # Too few keyframes in the stream to find scene changes, sample at a fixed rate instead
+            samples = self.sample_frames(recording_file_path, keyframes_only=False)
+
+        keyframes = []
+        for timestamp in self.find_scene_changes(samples):
+            record = ImageProcessor.process_bytes(self.grab_frame(recording_file_path, timestamp))
+            keyframes.append({"time": timestamp, "source": record["source"], "bytes": record["bytes"]})
+        return keyframes
+
+    def sample_frames(self, recording_file_path: str, keyframes_only: bool) -> List[tuple]:
+        width, height = KEYFRAME_THUMBNAIL_SIZE
+        filters = f"scale={width}:{height},format=gray,showinfo"
+        command = [self.ffmpeg_path, "-nostdin", "-loglevel", "info"]
+        if keyframes_only:
+            command += ["-skip_frame", "nokey"]
+        else:
+            filters = f"fps=1/{KEYFRAME_SAMPLE_SECONDS}," + filters
+        # -vsync rather than -fps_mode, which only exists since ffmpeg 5.1; newer versions still accept -vsync
+        command += ["-i", recording_file_path, "-an", "-vf", filters, "-vsync", "passthrough", "-f", "rawvideo", "pipe:1"]
+
+        with tempfile.TemporaryFile() as log:
+            result = subprocess.run(command, stdout=subprocess.PIPE, stderr=log)
+            log.seek(0)
+            output = log.read().decode('utf-8', errors='replace')
+        if result.returncode != 0:
+            raise RuntimeError(f"ffmpeg failed to sample frames: {output.strip().splitlines()[-1] if output.strip() else result.returncode}")
+
+        timestamps = [float(value) for value in re.findall(r"pts_time:\s*([0-9.]+)", output)]
+        frames = np.frombuffer(result.stdout, dtype=np.uint8)
+        frame_count = min(len(frames) // (width * height), len(timestamps))
+        frames = frames[:frame_count * width * height].reshape(frame_count, height, width)
+        return list(zip(timestamps, frames))
+
+    def find_scene_changes(self, samples: List[tuple]) -> List[float]:
+        if not samples:
+            return []
+
+        changes = [(float("inf"), samples[0][0])]
+        for (_, previous), (timestamp, frame) in zip(samples, samples[1:]):
+            difference = float(np.mean(np.abs(frame.astype(np.int16) - previous.astype(np.int16))))
+            if difference >= self.threshold:
+                changes.append((difference, timestamp))
+
+        chosen: List[float] = []
+        for _, timestamp in sorted(changes, reverse=True):
+            if len(chosen) == self.max_keyframes:
+                break
+            if all(abs(timestamp - other) >= self.min_gap_seconds for other in chosen):
+                chosen.append(timestamp)
+        return sorted(chosen)
+
+    def grab_frame(self, recording_file_path: str, timestamp: float) -> bytes:
+        command = [
+            self.ffmpeg_path, "-nostdin", "-loglevel", "error",
+            "-ss", f"{timestamp:.3f}", "-i", recording_file_path,
+            "-frames:v", "1", "-f", "image2pipe", "-c:v", "png", "pipe:1"
+        ]
+        result = subprocess.run(command, capture_output=True)
+        if result.returncode != 0 or not result.stdout:
+            raise RuntimeError(f"ffmpeg failed to grab the frame at {timestamp:.1f}s: {result.stderr.decode('utf-8', errors='replace').strip()}")
+        return result.stdout
+
+    @staticmethod
+    def caption(timestamp: float, transcript: str) -> str:
+        """Describes a keyframe with the transcript line spoken closest before it, using the [HH:MM:SS] stamps of the transcript."""
+        spoken = ""
+        for line in transcript.splitlines():
+            match = re.match(r"\[(\d+):(\d+):(\d+)\] (.*)", line)
+            if not match:
+                continue
+            hours, minutes, seconds, text = match.groups()
+            if int(hours) * 3600 + int(minutes) * 60 + int(seconds) > timestamp:
+                break
+            spoken = text
+        caption = f"Frame from the recording at {DataProcessor.format_timestamp(timestamp)}"
+        return f"{caption}, shortly after this was said: \"{spoken}\"" if spoken else caption
+
+class AudioChunker:
+    def __init__(self, sample_rate: int = TRANSCRIPTION_SAMPLE_RATE, max_chunk_seconds: float = MAX_CHUNK_SECONDS,
+                 search_seconds: float = SILENCE_SEARCH_SECONDS, frame_seconds: float = SILENCE_FRAME_SECONDS,
+                 ffmpeg_path: Optional[str] = None, codec: str = "wav"):
+        if codec != "wav" and not ffmpeg_path:
+            raise ValueError(f"Encoding chunks as '{codec}' requires ffmpeg.")
+        self.sample_rate = sample_rate
+        self.ffmpeg_path = ffmpeg_path
+        self.codec = codec
+        self.extension = CHUNK_CODECS[codec][1] if codec in CHUNK_CODECS else "wav"
+        self.max_samples = int(max_chunk_seconds * sample_rate)
+        self.search_samples = min(int(search_seconds * sample_rate), self.max_samples)
+        self.frame_samples = max(int(frame_seconds * sample_rate), 1)
+
+    def split(self, blocks: Iterable[np.ndarray]) -> Iterator[AudioChunk]:
+        """Cuts a stream of mono int16 sample blocks into chunks no longer than max_chunk_seconds,
+        placing each cut at the quietest point near the end of the chunk."""
+        pending: List[np.ndarray] = []
+        pending_samples = 0
+        offset = 0
+        index = 0
+
+        for block in blocks:
+            pending.append(block)
+            pending_samples += len(block)
+            if pending_samples < self.max_samples:
+                continue
+
+            buffer = np.concatenate(pending)
+            while len(buffer) >= self.max_samples:
+                cut = self.find_silence(buffer[:self.max_samples])
+                yield self.make_chunk(index, offset, buffer[:cut])
+                index += 1
+                offset += cut
+                buffer = buffer[cut:]
+            pending = [buffer]
+            pending_samples = len(buffer)
+
+        if pending_samples:
+            yield self.make_chunk(index, offset, np.concatenate(pending))
+
+    def find_silence(self, samples: np.ndarray) -> int:
+        window = samples[-self.search_samples:]
+        frame_count = len(window) // self.frame_samples
+        if frame_count == 0:
+            return len(samples)
+
+        frames = window[:frame_count * self.frame_samples].reshape(frame_count, self.frame_samples).astype(np.float32)
+        energy = np.mean(frames ** 2, axis=1)
+        quietest = int(np.argmin(energy))
+        return len(samples) - len(window) + quietest * self.frame_samples + self.frame_samples // 2
+
+    def make_chunk(self, index: int, offset: int, samples: np.ndarray) -> AudioChunk:
+        return AudioChunk(
+            index=index,
+            start=offset / self.sample_rate,
+            end=(offset + len(samples)) / self.sample_rate,
+            data=self.encode(samples),
+            filename=f"chunk_{index:04d}.{self.extension}"
+        )
+
+    def encode(self, samples: np.ndarray) -> bytes:
+        with Tracer.span("audio.encode", "audio", codec=self.codec, audio_seconds=round(len(samples) / self.sample_rate, 1)) as span:
+            data = self.encode_ffmpeg(samples) if self.codec in CHUNK_CODECS else self.encode_wav(samples)
+            span["encoded_bytes"] = len(data)
+        return data
+
+    def encode_ffmpeg(self, samples: np.ndarray) -> bytes:
+        command = [
+            self.ffmpeg_path, "-nostdin", "-loglevel", "error",
+            "-f", "s16le", "-ar", str(self.sample_rate), "-ac", "1", "-i", "pipe:0",
+            *CHUNK_CODECS[self.codec][0], "pipe:1"
+        ]
+        result = subprocess.run(command, input=samples.astype(np.int16).tobytes(), capture_output=True)
+        if result.returncode != 0:
+            raise RuntimeError(f"ffmpeg failed to encode chunk: {result.stderr.decode('utf-8', errors='replace').strip()}")
+        return result.stdout
+
+    def encode_wav(self, samples: np.ndarray) -> bytes:
+        buffer = io.BytesIO()
+        with wave.open(buffer, "wb") as wav_file:
+            wav_file.setnchannels(1)
+            wav_file.setsampwidth(2)
+            wav_file.setframerate(self.sample_rate)
+            wav_file.writeframes(samples.astype(np.int16).tobytes())
+        return buffer.getvalue()
+
+class JiraMarkup:
+    """Converts Jira wiki markup into compact, XML-safe prompt text in a single regex pass per field.
+    Formatting the model does not need (panels, macros, colors, emphasis markers, table borders) is
+    dropped, links, mentions, images, lists and code keep a short markdown-like form."""
+
+    pattern = re.compile(r"""
+        \{(?P<code_tag>code|noformat)(?::[^}]*)?\}(?P<code>.*?)\{(?P=code_tag)\}
+        | \{\{(?P<monospace>.+?)\}\}
+        | \{[a-zA-Z]+(?::[^}]*)?\}
+        | \[~(?:accountid:)?(?P<mention>[^\]]+)\]
+        | \[(?P<link_text>[^\]|\n]+)\|(?P<link_url>[^\]\n]+)\]
+        | \[(?P<link>(?:https?|mailto):[^\]\n]+)\]
+        | !(?P<image>[^!\s|]+)(?:\|[^!\n]*)?!
+        | ^[ \t]*(?P<heading>h[1-6])\.[ \t]*
+        | ^[ \t]*(?P<bullets>[*#-]+)[ \t]+
+        | ^[ \t]*-{4,}[ \t]*$
+        | (?P<table_border>\|\|)
+        | (?<![\w*])\*(?P<bold>[^*\s](?:[^*\n]*[^*\s])?)\*(?![\w*])
+        | (?<![\w_])_(?P<italic>[^_\s](?:[^_\n]*[^_\s])?)_(?![\w_])
+        | (?<![\w+])\+(?P<underline>[^+\s](?:[^+\n]*[^+\s])?)\+(?![\w+])
+        | (?<![\w-])-(?P<strike>[^-\s](?:[^-\n]*[^-\s])?)-(?![\w-])
+        | (?P<line_break>\\\\)
+        """, re.VERBOSE | re.MULTILINE | re.DOTALL)
+    blank_lines = re.compile(r"[ \t]*\n(?:[ \t]*\n)+")
+    spaces = re.compile(r"(?<=\S)[ \t]{2,}")
+
+    @staticmethod
+    def to_prompt(text: Optional[str], max_tokens: Optional[int] = None) -> str:
+        if not text:
+            return ""
+        text = JiraMarkup.pattern.sub(JiraMarkup.replace, text.replace("\r\n", "\n"))
+        text = JiraMarkup.blank_lines.sub("\n", JiraMarkup.spaces.sub(" ", text)).strip()
+        if max_tokens:
+            text = JiraMarkup.truncate(text, max_tokens)
+        return JiraMarkup.escape(text)
+
+    @staticmethod
+    def replace(match: re.Match) -> str:
+        groups = match.groupdict()
+        if groups["code_tag"]:
+            return f"\n```\n{groups['code'].strip()}\n```\n"
+        if groups["monospace"] is not None:
+            return f"`{groups['monospace']}`"
+        if groups["mention"]:
+            return f"@{groups['mention']}"
+        if groups["link_text"]:
+            return f"{JiraMarkup.pattern.sub(JiraMarkup.replace, groups['link_text'])} ({groups['link_url']})"
+        if groups["link"]:
+            return groups["link"]
+        if groups["image"]:
+            return f"[image: {groups['image']}]"
+        if groups["heading"]:
+            return "#" * int(groups["heading"][1]) + " "
+        if groups["bullets"]:
+            bullets = groups["bullets"]
+            return "  " * (len(bullets) - 1) + ("1. " if bullets[-1] == "#" else "- ")
+        if groups["table_border"]:
+            return "|"
+        for inline in ("bold", "italic", "underline"):
+            if groups[inline]:
+                return JiraMarkup.pattern.sub(JiraMarkup.replace, groups[inline])
+        if groups["strike"]:
+            return f"~~{groups['strike']}~~"
+        if groups["line_break"]:
+            return "\n"
+        # Macros, color codes and horizontal rules
+        return ""
+
+    @staticmethod
+    def truncate(text: str, max_tokens: int) -> str:
+        max_chars = max_tokens * 4
+        if len(text) <= max_chars:
+            return text
+        cut = text.rfind(" ", 0, max_chars)
+        cut = cut if cut > max_chars // 2 else max_chars
+        return f"{text[:cut].rstrip()} [truncated, {len(text) - cut} more characters]"
+
+    @staticmethod
+    def escape(text: str) -> str:
+        return html.escape(text, quote=False)
+
+class JiraClient:
+    """Jira REST client on one pooled Session. Retries 429 and 5xx responses honouring Retry-After with
+    exponential backoff and jitter, pages through search results and revalidates GETs with ETags."""
+
+    def __init__(self, base_url: str, username: str, api_key: str, max_retries: int = JIRA_MAX_RETRIES,
+                 backoff_seconds: float = JIRA_BACKOFF_SECONDS, page_size: int = JIRA_PAGE_SIZE, pool_size: int = JIRA_POOL_SIZE):
+        self.base_url = (base_url or "").rstrip("/")
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.page_size = page_size
+        self.session = requests.Session()
+        self.session.auth = requests.auth.HTTPBasicAuth(username, api_key)
+        self.session.headers.update({
+            "Accept": "application/json",
+            "Content-Type": "application/json"
+        })
+        adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.etags: Dict[str, tuple] = {}
+        self.lock = threading.Lock()
+        self.request_count = 0
+        self.retry_count = 0
+
+    def request(self, method: str, path: str, **kwargs: Any) -> requests.Response:
+        url = f"{self.base_url}{path}"
+        # Spans are grouped by endpoint ("issue", "search") rather than by full path
+        endpoint = path.split("/")[4] if path.startswith("/rest/api/") else path
+        with Tracer.span(f"jira.{method} {endpoint}", "jira", path=path) as span:
+            for attempt in range(self.max_retries + 1):
+                span["retries"] = attempt
+                with self.lock:
+                    self.request_count += 1
+                try:
+                    response = self.session.request(method, url, timeout=JIRA_TIMEOUT, **kwargs)
+                except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                    if attempt == self.max_retries:
+                        raise
+                    self.wait_before_retry(None, attempt)
+                    continue
+
+                if response.status_code in JIRA_RETRY_STATUSES and attempt < self.max_retries:
+                    self.wait_before_retry(response, attempt)
+                    continue
+
+                span.update(status=response.status_code, bytes_received=len(response.content))
+                response.raise_for_status()
+                return response
+
+    def wait_before_retry(self, response: Optional[requests.Response], attempt: int) -> None:
+        with self.lock:
+            self.retry_count += 1
+        delay = self.backoff_seconds * (2 ** attempt)
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after:
+            try:
+                delay = max(delay, float(retry_after))
+            except ValueError:
                 try:
-                    os.remove(temp_audio_path)
-                except PermissionError:
-                    ColorPrinter.print(f"Warning: Unable to delete temporary file: {temp_audio_path}", Fore.YELLOW)
+                    retry_at = email.utils.parsedate_to_datetime(retry_after)
+                    delay = max(delay, retry_at.timestamp() - time.time())
+                except (TypeError, ValueError):
+                    # A malformed Retry-After falls back to the computed backoff
+                    pass
+        time.sleep(delay + random.uniform(0, self.backoff_seconds))
+
+    def get_json(self, path: str, params: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+        cache_key = f"{path}?{sorted((params or {}).items())}"
+        headers = {}
+        with self.lock:
+            cached = self.etags.pop(cache_key, None)
+            if cached:
+                self.etags[cache_key] = cached
+        if cached:
+            headers["If-None-Match"] = cached[0]
+
+        response = self.request("GET", path, params=params, headers=headers)
+        if response.status_code == 304:
+            if cached:
+                return cached[1]
+            # Nothing stored to revalidate against, ask for the full body
+            response = self.request("GET", path, params=params)
+
+        data = response.json()
+        etag = response.headers.get("ETag")
+        if etag:
+            with self.lock:
+                self.etags.pop(cache_key, None)
+                self.etags[cache_key] = (etag, data)
+                while len(self.etags) > JIRA_ETAG_MAX_ENTRIES:
+                    del self.etags[next(iter(self.etags))]
+        return data
+
+    def search(self, jql: str, fields: List[str]) -> List[Dict[str, Any]]:
+        issues = []
+        start_at = 0
+        while True:
+            payload = {
+                "jql": jql,
+                "startAt": start_at,
+                "maxResults": self.page_size,
+                "fields": fields,
+                # Unknown issue keys become warnings instead of failing the whole query with a 400
+                "validateQuery": "warn"
+            }
+            page = self.request("POST", "/rest/api/2/search", json=payload).json()
+            page_issues = page.get("issues", [])
+            issues.extend(page_issues)
+            start_at += len(page_issues)
+            if not page_issues or start_at >= page.get("total", 0):
+                return issues
 
 class JiraAPI:
-    def __init__(self):
+    issue_fields = ["summary", "status", "assignee", "priority", "description", "parent", "updated"]
+    fetch_error = "<fetchedIssue>An unknown error occurred while fetching this issue.</fetchedIssue>"
+
+    def __init__(self, cache: Optional[ContentCache] = None, client: Optional[JiraClient] = None):
         self.base_url = os.getenv('JIRA_BASE_URL')
         self.username = os.getenv('ATLASSIAN_USERNAME')
         self.api_key = os.getenv('JIRA_API_KEY')
-        self.auth = HTTPBasicAuth(self.username, self.api_key)
-        self.headers = {
-            "Accept": "application/json",
-            "Content-Type": "application/json"
-        }
+        self.client = client or JiraClient(self.base_url, self.username, self.api_key)
+        self.cache = cache
+        # Every issue downloaded by a search, so the Jira tool can answer from memory, and when it was searched for.
+        # The service gives each session its own JiraAPI, so this lives only as long as the session
+        self.loaded_issues: Dict[str, Dict[str, Any]] = {}
+        self.loaded_at: Dict[str, float] = {}
+        self.lock = threading.Lock()
 
     def get_issue_data(self, primary_issue_key: str) -> List[str]:
-        issue_url = f"{self.base_url}/rest/api/2/issue/{primary_issue_key}?fields=parent,summary,status,assignee,priority,description"
         try:
-            response = requests.get(issue_url, headers=self.headers, auth=self.auth)
-            response.raise_for_status()
-            primary_issue = response.json()
+            primary_issue = self.client.get_json(f"/rest/api/2/issue/{primary_issue_key}", {"fields": "parent,updated"})
             parent_key = primary_issue['fields'].get('parent', {}).get('key', primary_issue_key)
 
             jql = f'issue = {parent_key} OR parent = {parent_key}'
-            payload = {
-                "jql": jql,
-                "startAt": 0,
-                "maxResults": 200,
-                "fields": [
-                    "summary",
-                    "status",
-                    "assignee",
-                    "priority",
-                    "description",
-                    "parent"
-                ]
-            }
+            return self.format_issues(self.fetch_issues(jql), primary_issue_key, parent_key)
+        
+        except requests.exceptions.RequestException as e:
+            raise RuntimeError(f"An error occurred while fetching Jira issues: {e}")
+
+    def get_batch_issue_data(self, jql: Optional[str] = None, keys: Optional[List[str]] = None) -> Dict[str, List[str]]:
+        """Fetches the issue trees of many cards with a handful of bulk searches. Cards that share a
+        parent share one download of the parent and its children."""
+        try:
+            if keys:
+                cards = []
+                for start in range(0, len(keys), JIRA_KEYS_PER_QUERY):
+                    cards.extend(self.search_issues(f"key in ({', '.join(keys[start:start + JIRA_KEYS_PER_QUERY])})", ["parent"]))
+                found = {card['key'] for card in cards}
+                missing = [key for key in keys if key.upper() not in found]
+                if missing:
+                    ColorPrinter.print(f"Warning: Skipping cards that were not found in Jira: {', '.join(missing)}", Fore.YELLOW)
+            else:
+                cards = self.search_issues(jql, ["parent"])
+
+            parent_keys = {card['key']: card['fields'].get('parent', {}).get('key', card['key']) for card in cards}
+            roots = list(dict.fromkeys(parent_keys.values()))
+
+            trees: Dict[str, List[Dict[str, Any]]] = {root: [] for root in roots}
+            for start in range(0, len(roots), JIRA_KEYS_PER_QUERY):
+                chunk = ', '.join(roots[start:start + JIRA_KEYS_PER_QUERY])
+                for issue in self.fetch_issues(f"key in ({chunk}) OR parent in ({chunk})"):
+                    if issue['key'] in trees:
+                        trees[issue['key']].append(issue)
+                    issue_parent = issue['fields'].get('parent', {}).get('key')
+                    if issue_parent in trees:
+                        trees[issue_parent].append(issue)
+
+            return {card_key: self.format_issues(trees[parent_key], card_key, parent_key) for card_key, parent_key in parent_keys.items()}
 
-            response = requests.post(f"{self.base_url}/rest/api/2/search", json=payload, headers=self.headers, auth=self.auth)
-            response.raise_for_status()
-
-            response_text = response.text
-            response_text = re.sub(r'-(.*?)-', r'<crossedout>\1</crossedout>', response_text)
-            response_text = re.sub(r'\{(color|bgColor):#([0-9a-fA-F]{6})\}(.*?)\{/(color|bgColor)\}', r'<highlighted>\3</highlighted>', response_text)
-            
-            search_results = response.json()
-
-            formatted_issues = []
-            for issue in search_results['issues']:
-                issue_key = issue['key']
-                summary = issue['fields']['summary']
-                status = issue['fields']['status']['name']
-                assignee = issue['fields'].get('assignee')
-                assignee = assignee['displayName'] if assignee else 'Unassigned'
-                priority = issue['fields']['priority']['name']
-                description = issue['fields'].get('description', 'No description provided')
-
-                issue_type = 'primaryIssue' if issue_key == primary_issue_key else ('parentIssue' if issue_key == parent_key else 'relatedIssue')
-
-                xml_string = f"""<{issue_type}>
-    <key>{issue_key}</key>
+        except requests.exceptions.RequestException as e:
+            raise RuntimeError(f"An error occurred while fetching Jira issues: {e}")
+
+    @staticmethod
+    def format_issues(issues: List[Dict[str, Any]], primary_issue_key: str, parent_key: str) -> List[str]:
+        formatted_issues = []
+        for issue in issues:
+            issue_key = issue['key']
+            issue_type = 'primaryIssue' if issue_key == primary_issue_key else ('parentIssue' if issue_key == parent_key else 'relatedIssue')
+            formatted_issues.append(JiraAPI.format_issue(issue, issue_type))
+
+        return formatted_issues
+
+    @staticmethod
+    def format_issue(issue: Dict[str, Any], issue_type: str) -> str:
+        summary = JiraMarkup.escape(issue['fields']['summary'])
+        status = JiraMarkup.escape(issue['fields']['status']['name'])
+        assignee = issue['fields'].get('assignee')
+        assignee = JiraMarkup.escape(assignee['displayName']) if assignee else 'Unassigned'
+        priority = issue['fields'].get('priority')
+        priority = JiraMarkup.escape(priority['name']) if priority else 'None'
+        description = JiraMarkup.to_prompt(issue['fields'].get('description'), JIRA_DESCRIPTION_MAX_TOKENS) or 'No description provided'
+
+        return f"""<{issue_type}>
+    <key>{issue['key']}</key>
     <summary>{summary}</summary>
     <status>{status}</status>
     <assignee>{assignee}</assignee>
@@ -276,115 +1384,550 @@ class JiraAPI:
     <description>{description}</description>
 </{issue_type}>"""
 
-                formatted_issues.append(xml_string)
-
-            return formatted_issues
-        
-        except requests.exceptions.RequestException as e:
-            raise RuntimeError(f"An error occurred while fetching Jira issues: {e}")
+    def fetch_issues(self, jql: str) -> List[Dict[str, Any]]:
+        fetched_at = time.time()
+        if self.cache:
+            issues = self.get_cached_issues(jql)
+        else:
+            issues = self.search_issues(jql, self.issue_fields)
+        with self.lock:
+            for issue in issues:
+                self.loaded_issues[issue['key']] = issue
+                self.loaded_at[issue['key']] = fetched_at
+        return issues
+
+    def search_issues(self, jql: str, fields: List[str]) -> List[Dict[str, Any]]:
+        return self.client.search(jql, fields)
+
+    def get_cached_issues(self, jql: str) -> List[Dict[str, Any]]:
+        """Lists only the keys and `updated` timestamps of the matching issues, then downloads full
+        fields for the issues that are not already cached at that timestamp."""
+        versions = [(issue['key'], issue['fields']['updated']) for issue in self.search_issues(jql, ["updated"])]
+
+        issues = {}
+        stale_keys = []
+        for issue_key, updated in versions:
+            cached = self.cache.get("jira", issue_key, updated)
+            if cached is None:
+                stale_keys.append(issue_key)
+            else:
+                issues[issue_key] = cached
+
+        for start in range(0, len(stale_keys), JIRA_KEYS_PER_QUERY):
+            chunk = ', '.join(stale_keys[start:start + JIRA_KEYS_PER_QUERY])
+            for issue in self.search_issues(f"key in ({chunk})", self.issue_fields):
+                self.cache.set("jira", [issue['key'], issue['fields']['updated']], issue)
+                issues[issue['key']] = issue
+
+        return [issues[issue_key] for issue_key, _ in versions if issue_key in issues]
 
     def fetch_single_issue(self, issue_key: str) -> str:
-        issue_url = f"{self.base_url}/rest/api/2/issue/{issue_key}"
         try:
-            response = requests.get(issue_url, headers=self.headers, auth=self.auth)
-            response.raise_for_status()
-            
-            issue_data = response.json()
-
-            summary = issue_data['fields']['summary']
-            status = issue_data['fields']['status']['name']
-            assignee = issue_data['fields'].get('assignee')
-            assignee = assignee['displayName'] if assignee else 'Unassigned'
-            priority = issue_data['fields']['priority']['name']
-            description = issue_data['fields'].get('description', 'No description provided')
-
-            xml_string = f"""<fetchedIssue>
-    <key>{issue_key}</key>
-    <summary>{summary}</summary>
-    <status>{status}</status>
-    <assignee>{assignee}</assignee>
-    <priority>{priority}</priority>
-    <description>{description}</description>
-</fetchedIssue>"""
+            with self.lock:
+                issue_data = self.loaded_issues.get(issue_key)
+            if issue_data is None:
+                issue_data = self.client.get_json(f"/rest/api/2/issue/{issue_key}")
 
-            return xml_string
+            return self.format_issue(issue_data, 'fetchedIssue')
 
         except:
-            return "<fetchedIssue>An unknown error occurred while fetching this issue.</fetchedIssue>"
+            return self.fetch_error
+
+class VaultIndex:
+    """BM25 index over the markdown notes and transcripts in the vault, kept in VAULT_INDEX_DIR inside it.
+    Notes are split into passages and the postings are stored as .npy arrays that are memory-mapped for
+    search. A refresh only reads and tokenizes notes that are new or changed since the last one; the postings
+    of the other notes are carried over, but the arrays are rewritten as a whole. The passages and the
+    vocabulary are JSON files held in memory."""
+
+    token_pattern = re.compile(r"[a-z0-9]+(?:-\d+)?")
+    stop_words = frozenset("a an and are as at be by for from has have in is it its of on or that the this to was were will with".split())
+
+    def __init__(self, vault_path: str):
+        self.vault_path = vault_path
+        self.directory = os.path.join(vault_path, VAULT_INDEX_DIR)
+        self.lock = threading.Lock()
+        # Relative note path -> {"mtime", "size", "passages"}
+        self.files: Dict[str, Dict[str, Any]] = {}
+        self.passages: List[tuple] = []
+        # Term -> [offset, count] into the postings arrays
+        self.vocabulary: Dict[str, List[int]] = {}
+        self.doc_ids = self.term_freqs = self.doc_lengths = None
+        self.loaded = False
+
+    def refresh(self) -> VaultIndex:
+        with self.lock, Tracer.span("vault_index.refresh", "vault_index", vault=self.vault_path):
+            if not self.loaded:
+                self.load()
+            current = self.scan()
+            changed = [path for path, (mtime, size) in current.items()
+                       if self.files.get(path, {}).get("mtime") != mtime or self.files.get(path, {}).get("size") != size]
+            removed = [path for path in self.files if path not in current]
+            if not changed and not removed and self.doc_lengths is not None:
+                return self
+
+            indexed_files = dict(self.files)
+            for path in changed:
+                mtime, size = current[path]
+                text = FileHandler.read_file(os.path.join(self.vault_path, path))
+                self.files[path] = {"mtime": mtime, "size": size, "passages": self.split_passages(text)}
+            for path in removed:
+                del self.files[path]
+
+            self.build(indexed_files, set(changed))
+            self.load()
+            ColorPrinter.print(f"Vault index: {len(changed)} notes indexed, {len(removed)} removed, "
+                               f"{len(self.passages)} passages from {len(self.files)} notes", Fore.BLUE)
+        return self
+
+    def scan(self) -> Dict[str, tuple]:
+        notes = {}
+        for root, dirs, files in os.walk(self.vault_path):
+            dirs[:] = [name for name in dirs if not name.startswith(".")]
+            for name in files:
+                if name.endswith(".md"):
+                    file_path = os.path.join(root, name)
+                    stat = os.stat(file_path)
+                    notes[os.path.relpath(file_path, self.vault_path)] = (stat.st_mtime_ns, stat.st_size)
+        return notes
+
+    @staticmethod
+    def split_passages(text: str) -> List[str]:
+        """Splits a note into passages of about INDEX_PASSAGE_WORDS words, starting a new one at every heading."""
+        passages, lines, words = [], [], 0
+        for line in text.splitlines():
+            if not line.strip():
+                continue
+            if lines and (words >= INDEX_PASSAGE_WORDS or line.lstrip().startswith("#")):
+                passages.append("\n".join(lines))
+                lines, words = [], 0
+            lines.append(line.strip())
+            words += len(line.split())
+        if lines:
+            passages.append("\n".join(lines))
+        return passages
+
+    @staticmethod
+    def tokenize(text: str) -> List[str]:
+        return [token for token in VaultIndex.token_pattern.findall(text.lower()) if token not in VaultIndex.stop_words]
+
+    def build(self, indexed_files: Dict[str, Dict[str, Any]], changed: set) -> None:
+        """Writes the postings of self.files. Only the passages of changed notes are tokenized, the postings of
+        the other notes are taken from the current arrays (built from indexed_files) and renumbered."""
+        # Passage ids are positions in sorted note order, so they shift when notes before them change
+        old_starts, position = {}, 0
+        for path in sorted(indexed_files):
+            old_starts[path] = position
+            position += len(indexed_files[path]["passages"])
+        has_postings = self.doc_lengths is not None and len(self.doc_lengths) == position
+        # Copies, not views: a view keeps its memory map open and the files below could not be replaced on Windows
+        old_doc_lengths = np.array(self.doc_lengths, dtype=np.float32) if has_postings else np.zeros(0, dtype=np.float32)
+        remap = np.full(len(old_doc_lengths), -1, dtype=np.int64)
+
+        doc_lengths = []
+        new_postings: Dict[str, List[tuple]] = {}
+        for path in sorted(self.files):
+            passages = self.files[path]["passages"]
+            if has_postings and path in old_starts and path not in changed:
+                start = old_starts[path]
+                remap[start:start + len(passages)] = np.arange(len(doc_lengths), len(doc_lengths) + len(passages))
+                doc_lengths.extend(old_doc_lengths[start:start + len(passages)])
+                continue
+            name = os.path.splitext(os.path.basename(path))[0]
+            for passage in passages:
+                tokens = self.tokenize(f"{name} {passage}")
+                counts: Dict[str, int] = {}
+                for token in tokens:
+                    counts[token] = counts.get(token, 0) + 1
+                for token, count in counts.items():
+                    new_postings.setdefault(token, []).append((len(doc_lengths), count))
+                doc_lengths.append(len(tokens))
+
+        old_terms = sorted(self.vocabulary, key=lambda term: self.vocabulary[term][0]) if has_postings else []
+        terms = sorted(set(old_terms) | set(new_postings))
+        term_ids = {term: term_id for term_id, term in enumerate(terms)}
+        if old_terms:
+            old_counts = [self.vocabulary[term][1] for term in old_terms]
+            old_term_ids = np.repeat(np.asarray([term_ids[term] for term in old_terms], dtype=np.int64), old_counts)
+            old_docs = remap[np.array(self.doc_ids)]
+            kept = old_docs >= 0
+            old_term_ids, old_docs, old_freqs = old_term_ids[kept], old_docs[kept], np.array(self.term_freqs)[kept]
+        else:
+            old_term_ids = old_docs = np.zeros(0, dtype=np.int64)
+            old_freqs = np.zeros(0, dtype=np.float32)
+        new_term_ids = [term_ids[term] for term in new_postings for _ in new_postings[term]]
+        new_docs = [doc_id for term in new_postings for doc_id, _ in new_postings[term]]
+        new_freqs = [count for term in new_postings for _, count in new_postings[term]]
+
+        term_column = np.concatenate([old_term_ids, np.asarray(new_term_ids, dtype=np.int64)])
+        doc_column = np.concatenate([old_docs, np.asarray(new_docs, dtype=np.int64)])
+        freq_column = np.concatenate([old_freqs, np.asarray(new_freqs, dtype=np.float32)])
+        order = np.lexsort((doc_column, term_column))
+        counts = np.bincount(term_column, minlength=len(terms))
+        offsets = np.cumsum(counts) - counts
+        # Terms that only occurred in changed or removed notes drop out here
+        vocabulary = {term: [int(offsets[term_id]), int(counts[term_id])] for term_id, term in enumerate(terms) if counts[term_id]}
+        arrays = (("doc_ids", doc_column[order], np.int32), ("term_freqs", freq_column[order], np.float32),
+                  ("doc_lengths", doc_lengths, np.float32))
+
+        # Release the memory maps first, mapped files cannot be replaced on Windows
+        del old_doc_lengths
+        self.doc_ids = self.term_freqs = self.doc_lengths = None
+        os.makedirs(self.directory, exist_ok=True)
+        for name, values, dtype in arrays:
+            temp_path = os.path.join(self.directory, f"{name}.tmp.npy")
+            np.save(temp_path, np.asarray(values, dtype=dtype))
+            os.replace(temp_path, os.path.join(self.directory, f"{name}.npy"))
+        for name, value in (("vocabulary", vocabulary), ("files", self.files)):
+            temp_path = os.path.join(self.directory, f"{name}.json.tmp")
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(value, f)
+            os.replace(temp_path, os.path.join(self.directory, f"{name}.json"))
+
+    def load(self) -> None:
+        self.loaded = True
+        try:
+            with open(os.path.join(self.directory, "files.json"), 'r', encoding='utf-8') as f:
+                files = json.load(f)
+            with open(os.path.join(self.directory, "vocabulary.json"), 'r', encoding='utf-8') as f:
+                vocabulary = json.load(f)
+            arrays = [np.load(os.path.join(self.directory, f"{name}.npy"), mmap_mode='r') for name in ("doc_ids", "term_freqs", "doc_lengths")]
+        except (OSError, ValueError):
+            return
+        self.files, self.vocabulary = files, vocabulary
+        self.doc_ids, self.term_freqs, self.doc_lengths = arrays
+        self.passages = [(path, passage) for path in sorted(files) for passage in files[path]["passages"]]
+
+    def search(self, query: str, max_results: int = INDEX_SEARCH_RESULTS) -> List[Dict[str, Any]]:
+        with Tracer.span("vault_index.search", "vault_index", query=query):
+            return self.score(query, max_results)
+
+    def score(self, query: str, max_results: int) -> List[Dict[str, Any]]:
+        with self.lock:
+            doc_ids, term_freqs, doc_lengths, vocabulary, passages = self.doc_ids, self.term_freqs, self.doc_lengths, self.vocabulary, self.passages
+        if doc_lengths is None or not len(doc_lengths):
+            return []
+
+        doc_count = len(doc_lengths)
+        length_norm = 1 - BM25_B + BM25_B * np.asarray(doc_lengths) / max(float(np.mean(doc_lengths)), 1.0)
+        scores = np.zeros(doc_count, dtype=np.float32)
+        for term in set(self.tokenize(query)):
+            if term not in vocabulary:
+                continue
+            offset, count = vocabulary[term]
+            docs = np.asarray(doc_ids[offset:offset + count])
+            freqs = np.asarray(term_freqs[offset:offset + count])
+            idf = np.log(1 + (doc_count - count + 0.5) / (count + 0.5))
+            scores[docs] += idf * freqs * (BM25_K1 + 1) / (freqs + BM25_K1 * length_norm[docs])
+
+        top = np.argsort(-scores)[:max_results]
+        return [{"note": passages[doc_id][0], "score": float(scores[doc_id]), "text": passages[doc_id][1]} for doc_id in top if scores[doc_id] > 0]
+
+    def format_results(self, query: str, max_results: int = INDEX_SEARCH_RESULTS) -> str:
+        results = self.search(query, max_results)
+        if not results:
+            return f"<searchResults>No notes in the vault match '{JiraMarkup.escape(query)}'.</searchResults>"
+        passages = "".join(f"""
+<searchResult note="{JiraMarkup.escape(result['note'])}" score="{result['score']:.2f}">{JiraMarkup.escape(result['text'])}</searchResult>"""
+                           for result in results)
+        return f"<searchResults>{passages}\n</searchResults>"
+
+class ConversationHistory:
+    """Token-bounded view of a Q&A session. The ingestion prefix (data, summary and chatbot prompt) is
+    sent unchanged on every turn so it stays in the prompt cache, recent turns are kept verbatim, and
+    older turns are replaced by a rolling summary once they exceed HISTORY_TOKEN_BUDGET."""
+
+    def __init__(self, prefix: List[Dict[str, Any]], summarizer: Callable[[str, str], str],
+                 token_budget: int = HISTORY_TOKEN_BUDGET, keep_turns: int = HISTORY_KEEP_TURNS):
+        self.prefix = prefix
+        self.summarizer = summarizer
+        self.token_budget = token_budget
+        self.keep_turns = keep_turns
+        self.turns: List[List[Dict[str, Any]]] = []
+        self.summary = ""
+        self.prefix_issue_keys = set(ISSUE_KEY_PATTERN.findall(self.render(prefix)))
+
+    def messages(self) -> List[Dict[str, Any]]:
+        messages = list(self.prefix)
+        if self.summary:
+            messages.append({"role": "user", "content": f"<earlier_conversation_summary>{self.summary}</earlier_conversation_summary>"})
+            messages.append({"role": "assistant", "content": "Understood, I will keep the earlier conversation in mind."})
+        for turn in self.turns:
+            messages.extend(turn)
+        return messages
+
+    def add_turn(self, turn: List[Dict[str, Any]]) -> None:
+        shown_keys = self.prefix_issue_keys | set(ISSUE_KEY_PATTERN.findall(self.render([message for old_turn in self.turns for message in old_turn])))
+        self.turns.append([self.dedupe_tool_results(message, shown_keys) for message in turn])
+        if self.estimate_tokens([message for turn in self.turns for message in turn]) > self.token_budget:
+            self.compact()
+
+    def compact(self) -> None:
+        keep = self.turns[-self.keep_turns:] if self.keep_turns else []
+        old_turns = self.turns[:len(self.turns) - len(keep)]
+        if not old_turns:
+            return
+
+        ColorPrinter.print(f"\nCompacting {len(old_turns)} earlier questions into the conversation summary...", Fore.BLUE)
+        self.summary = self.summarizer(self.summary, self.render([message for turn in old_turns for message in turn]))
+        self.turns = keep
+
+    @staticmethod
+    def dedupe_tool_results(message: Dict[str, Any], shown_keys: set) -> Dict[str, Any]:
+        """Replaces Jira tool results for cards whose details are already in the conversation with a short reference."""
+        if message["role"] != "user" or isinstance(message["content"], str):
+            return message
+
+        content = []
+        for block in message["content"]:
+            if isinstance(block, dict) and block.get("type") == "tool_result" and isinstance(block.get("content"), str):
+                keys = ISSUE_KEY_PATTERN.findall(block["content"])
+                if keys and all(key in shown_keys for key in keys):
+                    block = {**block, "content": f"<fetchedIssue><key>{keys[0]}</key>Already shown earlier in this conversation.</fetchedIssue>"}
+            content.append(block)
+        return {**message, "content": content}
+
+    @staticmethod
+    def block_dict(block: Any) -> Dict[str, Any]:
+        if isinstance(block, dict):
+            return block
+        return block.model_dump() if hasattr(block, "model_dump") else vars(block)
+
+    @staticmethod
+    def render(messages: List[Dict[str, Any]]) -> str:
+        lines = []
+        for message in messages:
+            content = message["content"]
+            if isinstance(content, str):
+                lines.append(f"{message['role'].capitalize()}: {content}")
+                continue
+            for block in map(ConversationHistory.block_dict, content):
+                if block.get("type") == "text":
+                    lines.append(f"{message['role'].capitalize()}: {block['text']}")
+                elif block.get("type") == "tool_use":
+                    lines.append(f"Assistant used the {block['name']} tool with {json.dumps(block['input'])}")
+                elif block.get("type") == "tool_result":
+                    lines.append(f"Tool result: {block.get('content')}")
+        return "\n".join(lines)
+
+    @staticmethod
+    def estimate_tokens(messages: List[Dict[str, Any]]) -> int:
+        tokens = 0
+        for message in messages:
+            content = message["content"]
+            if isinstance(content, str):
+                tokens += len(content) // 4
+                continue
+            for block in map(ConversationHistory.block_dict, content):
+                if block.get("type") == "image":
+                    tokens += IMAGE_TOKEN_ESTIMATE
+                else:
+                    tokens += len(json.dumps(block, default=str)) // 4
+        return tokens
 
 class AIAssistant:
-    def __init__(self, openai_client: OpenAI, claude_client: anthropic.Anthropic):
+    def __init__(self, openai_client: OpenAI, claude_client: anthropic.Anthropic, jira_api: Optional[JiraAPI] = None,
+                 max_tool_steps: int = TOOL_MAX_STEPS, vault_index: Optional[VaultIndex] = None):
         self.whisper = openai_client
         self.claude = claude_client
-        self.jira_api = JiraAPI()
-
-    def get_claude_response(self, conversation_history: List[Dict[str, str]]) -> str:
-        response = self.claude.messages.create(
-            model="claude-3-5-sonnet-20240620",
-            max_tokens=1000,
-            temperature=0.6,
-            system=chatbot_system_prompt,
-            messages=conversation_history,
-            tools=[jira_tool]
-        )
-
+        self.jira_api = jira_api or JiraAPI()
+        self.max_tool_steps = max_tool_steps
+        self.vault_index = vault_index
+        # Jira cards fetched through the tool during this session
+        self.fetched_issues: Dict[str, str] = {}
+        self.usage_history: List[TurnUsage] = []
+        self.lock = threading.Lock()
+
+    def get_claude_response(self, conversation_history: List[Dict[str, str]], on_text: Optional[Callable[[str], None]] = None) -> str:
+        """Runs the tool-use loop: every tool_use block of a response is executed concurrently and the results
+        are sent back until Claude ends its turn. On the last allowed step tools are disabled so it has to answer."""
+        for step in range(self.max_tool_steps + 1):
+            tool_choice = {"type": "none"} if step == self.max_tool_steps else None
+            tools = [jira_tool, vault_search_tool] if self.vault_index else [jira_tool]
+            response = self.create_message(chatbot_system_prompt, conversation_history, 1000, tools, on_text, tool_choice, cacheable=True)
+            tool_uses = [block for block in response.content if block.type == "tool_use"]
+            if response.stop_reason != "tool_use" or not tool_uses:
+                break
 
-        if response.stop_reason == "tool_use":
-            tool_use = response.content[-1]
-            tool_name = tool_use.name
-            tool_input = tool_use.input
             conversation_history.append({"role": "assistant", "content": response.content})
+            ColorPrinter.print(f"\nClaude wants to use {len(tool_uses)} tool{'s' if len(tool_uses) > 1 else ''}", Fore.YELLOW)
+            with ThreadPoolExecutor(max_workers=len(tool_uses)) as executor:
+                tool_results = list(executor.map(self.run_traced_tool, tool_uses))
+            conversation_history.append({"role": "user", "content": tool_results})
+
+        return "".join(block.text for block in response.content if block.type == "text")
+
+    def run_traced_tool(self, tool_use: Any) -> Dict[str, Any]:
+        with Tracer.span(f"tool.{tool_use.name}", "tool", input=tool_use.input) as span:
+            result = self.run_tool(tool_use)
+            span["bytes_received"] = len(result["content"])
+        return result
+
+    def run_tool(self, tool_use: Any) -> Dict[str, Any]:
+        if tool_use.name == vault_search_tool["name"] and self.vault_index:
+            query = str(tool_use.input.get("query", ""))
+            try:
+                max_results = min(max(int(tool_use.input.get("max_results") or INDEX_SEARCH_RESULTS), 1), INDEX_SEARCH_MAX_RESULTS)
+            except (TypeError, ValueError):
+                max_results = INDEX_SEARCH_RESULTS
+            start = time.perf_counter()
+            results = self.vault_index.format_results(query, max_results)
+            ColorPrinter.print(f"Searched the vault for '{query}' in {(time.perf_counter() - start) * 1000:.1f} ms", Fore.YELLOW)
+            return {"type": "tool_result", "tool_use_id": tool_use.id, "content": results}
+        if tool_use.name != "Jira":
+            return {"type": "tool_result", "tool_use_id": tool_use.id, "content": f"Unknown tool: {tool_use.name}", "is_error": True}
+
+        card_name = str(tool_use.input.get("card_name", "")).strip().upper()
+        with self.lock:
+            formatted_jira_issue = self.fetched_issues.get(card_name)
+        if formatted_jira_issue is None:
+            formatted_jira_issue = self.jira_api.fetch_single_issue(card_name)
+            if formatted_jira_issue != JiraAPI.fetch_error:
+                with self.lock:
+                    self.fetched_issues[card_name] = formatted_jira_issue
+        ColorPrinter.print(f"Fetched Jira issue {card_name} with content length {len(formatted_jira_issue)}", Fore.YELLOW)
+
+        return {
+            "type": "tool_result",
+            "tool_use_id": tool_use.id,
+            "content": formatted_jira_issue
+        }
 
-            if tool_name == "Jira":
-                ColorPrinter.print("Claude wants to use a tool", Fore.YELLOW)
-                card_name = tool_input["card_name"]
-                try:
-                    formatted_jira_issue = self.jira_api.fetch_single_issue(card_name)
-                    tool_response = {
-                        "role": "user",
-                        "content": [
-                            {
-                                "type": "tool_result",
-                                "tool_use_id": tool_use.id,
-                                "content": formatted_jira_issue
-                            }
-                        ]
-                    }
-                    ColorPrinter.print(f"Fetched Jira issue {card_name} with content length {len(formatted_jira_issue)}", Fore.YELLOW)
-                    conversation_history.append(tool_response)
-                    response = self.claude.messages.create(
-                        model="claude-3-5-sonnet-20240620",
-                        max_tokens=1000,
-                        temperature=0.6,
-                        system=chatbot_system_prompt,
-                        messages=conversation_history,
-                        tools=[jira_tool]
-                    )
-                except ValueError as e:
-                    ColorPrinter.print(f"Error: {str(e)}", Fore.RED)
-
-        return response.content[0].text
-
-    def initial_conversation(self, conversation_history: List[Dict[str, str]], folder_path: str, file_name: str) -> List[Dict[str, str]]:
-        summary = self.claude.messages.create(
-            model="claude-3-5-sonnet-20240620",
-            max_tokens=4096,
-            temperature=0.6,
-            system=initial_summary_system_prompt,
-            messages=conversation_history,
-        ).content[0].text
-        ColorPrinter.print("\nClaude's Initial Summary:", Fore.LIGHTRED_EX)
-        ColorPrinter.print(summary, Fore.GREEN)
+    def generate_summary(self, conversation_history: List[Dict[str, str]], on_text: Optional[Callable[[str], None]] = None) -> str:
+        return self.create_message(initial_summary_system_prompt, conversation_history, 4096, on_text=on_text).content[0].text
+
+    def create_message(self, system_prompt: str, conversation_history: List[Dict[str, Any]], max_tokens: int,
+                       tools: Optional[List[Dict[str, Any]]] = None, on_text: Optional[Callable[[str], None]] = None,
+                       tool_choice: Optional[Dict[str, str]] = None, cacheable: bool = False) -> Any:
+        """Sends one request. When on_text is given the response is streamed and every text delta is
+        passed to it as it arrives; the complete message is returned either way. Only cacheable requests,
+        the Q&A turns that are followed by requests with the same prefix, get prompt caching breakpoints."""
+        request = self.build_request(system_prompt, conversation_history, max_tokens, tools, tool_choice, cacheable)
+        counted_tokens = self.count_tokens(request)
+        if counted_tokens and counted_tokens > CONTEXT_TOKEN_BUDGET:
+            ColorPrinter.print(f"Warning: This request is {counted_tokens} input tokens, over the budget of {CONTEXT_TOKEN_BUDGET}.", Fore.RED)
+
+        with Tracer.span("claude.messages", "claude", max_tokens=max_tokens, streaming=bool(on_text)) as span:
+            start = time.perf_counter()
+            first_token = None
+            if on_text and hasattr(self.claude.messages, "stream"):
+                with self.claude.messages.stream(**request) as stream:
+                    for text in stream.text_stream:
+                        if first_token is None:
+                            first_token = time.perf_counter() - start
+                        on_text(text)
+                    response = stream.get_final_message()
+            else:
+                response = self.claude.messages.create(**request)
+                if on_text:
+                    first_token = time.perf_counter() - start
+                    for block in response.content:
+                        if getattr(block, "type", "text") == "text":
+                            on_text(block.text)
+
+            turn = self.report_usage(counted_tokens, getattr(response, "usage", None), time.perf_counter() - start, first_token)
+            input_tokens = turn.input_tokens + turn.cache_read_tokens + turn.cache_write_tokens or counted_tokens or 0
+            span.update({name: getattr(turn, name) for name in CLAUDE_PRICE_PER_MTOK}, time_to_first_token=first_token,
+                        bytes_sent=self.estimate_request_bytes(request, input_tokens),
+                        stop_reason=getattr(response, "stop_reason", None),
+                        cost_usd=sum(getattr(turn, name) * price for name, price in CLAUDE_PRICE_PER_MTOK.items()) / 1e6)
+        return response
 
-        file_path = os.path.join(folder_path, file_name)
-        with open(file_path, 'w', encoding='utf-8') as file:
-            file.write(summary)
+    @staticmethod
+    def estimate_request_bytes(request: Dict[str, Any], input_tokens: int) -> int:
+        """Upload size of a request without serializing it: the base64 data of every image plus about 4 bytes
+        per token for the rest."""
+        image_bytes = image_count = 0
+        for message in request["messages"]:
+            if isinstance(message["content"], str):
+                continue
+            for block in message["content"]:
+                if isinstance(block, dict) and block.get("type") == "image":
+                    image_bytes += len(block["source"].get("data", ""))
+                    image_count += 1
+        return image_bytes + max(input_tokens - image_count * IMAGE_TOKEN_ESTIMATE, 0) * 4
 
-        conversation_history.append({"role": "assistant", "content": summary})
-        return conversation_history
+    @staticmethod
+    def build_request(system_prompt: str, conversation_history: List[Dict[str, Any]], max_tokens: int,
+                      tools: Optional[List[Dict[str, Any]]] = None, tool_choice: Optional[Dict[str, str]] = None,
+                      cacheable: bool = False) -> Dict[str, Any]:
+        """Builds a messages.create request. A cacheable request gets prompt caching breakpoints on the system
+        prompt, on the ingested data in the first message and on the latest user message, so every follow-up
+        request only pays full price for what was added since the previous one. One-shot requests get none,
+        since a cache write costs more than uncached input and would never be read back."""
+        messages = list(conversation_history)
+        user_indexes = [index for index, message in enumerate(messages) if message["role"] == "user"]
+        for index in {user_indexes[0], user_indexes[-1]} if user_indexes and cacheable else ():
+            messages[index] = AIAssistant.with_cache_breakpoint(messages[index])
+
+        system = {"type": "text", "text": system_prompt}
+        request = {
+            "model": CLAUDE_MODEL,
+            "max_tokens": max_tokens,
+            "temperature": CLAUDE_TEMPERATURE,
+            "system": [{**system, "cache_control": CACHE_CONTROL} if cacheable else system],
+            "messages": messages,
+        }
+        if tools:
+            request["tools"] = tools
+        if tool_choice:
+            request["tool_choice"] = tool_choice
+        return request
+
+    @staticmethod
+    def with_cache_breakpoint(message: Dict[str, Any]) -> Dict[str, Any]:
+        content = message["content"]
+        if isinstance(content, str):
+            content = [{"type": "text", "text": content}]
+        if not content:
+            return message
+        content = list(content)
+        content[-1] = {**content[-1], "cache_control": CACHE_CONTROL}
+        return {**message, "content": content}
+
+    def count_tokens(self, request: Dict[str, Any]) -> Optional[int]:
+        with Tracer.span("claude.count_tokens", "claude"):
+            try:
+                return self.claude.messages.count_tokens(
+                    model=request["model"],
+                    system=request["system"],
+                    messages=request["messages"],
+                    **({"tools": request["tools"]} if "tools" in request else {})
+                ).input_tokens
+            except Exception:
+                return None
+
+    def report_usage(self, counted_tokens: Optional[int], usage: Any, seconds: float, time_to_first_token: Optional[float] = None) -> TurnUsage:
+        turn = TurnUsage(
+            counted_input_tokens=counted_tokens,
+            input_tokens=getattr(usage, "input_tokens", 0) or 0,
+            cache_read_tokens=getattr(usage, "cache_read_input_tokens", 0) or 0,
+            cache_write_tokens=getattr(usage, "cache_creation_input_tokens", 0) or 0,
+            output_tokens=getattr(usage, "output_tokens", 0) or 0,
+            seconds=seconds,
+            time_to_first_token=time_to_first_token
+        )
+        with self.lock:
+            self.usage_history.append(turn)
+        total_input = turn.input_tokens + turn.cache_read_tokens + turn.cache_write_tokens
+        streaming = ""
+        if time_to_first_token is not None:
+            generation_seconds = max(seconds - time_to_first_token, 1e-6)
+            streaming = f", first token after {time_to_first_token:.2f}s, {turn.output_tokens / generation_seconds:.0f} tokens/s"
+        ColorPrinter.print(f"\nTokens: {total_input} in ({turn.cache_read_tokens} cached, {turn.cache_write_tokens} written to cache, "
+                           f"{turn.input_tokens} uncached), {turn.output_tokens} out in {seconds:.1f}s{streaming}", Fore.BLUE)
+        return turn
+
+    def summarize_history(self, previous_summary: str, transcript: str) -> str:
+        prompt = f"""<previous_summary>{previous_summary}</previous_summary>
+<conversation>{transcript}</conversation>
+Update the previous summary with this part of a Q&A session about Jira issues. Keep every question asked, the key facts and
+conclusions in the answers and the Jira card keys discussed. Reply with the summary only."""
+        return self.create_message(history_summary_system_prompt, [{"role": "user", "content": prompt}], HISTORY_SUMMARY_MAX_TOKENS).content[0].text
 
     def interactive_conversation(self, conversation_history: List[Dict[str, str]]) -> None:
         ColorPrinter.print("\nYou can now ask questions about the Jira issues. Type 'exit' to end the conversation.", Fore.LIGHTRED_EX)
+        history = ConversationHistory(conversation_history, self.summarize_history)
         while True:
             user_input = ColorPrinter.input("\nYour question: ", Fore.GREEN)
             if user_input.lower() == 'exit':
@@ -392,51 +1935,448 @@ class AIAssistant:
             elif not user_input:
                 ColorPrinter.print("Please enter a valid question.", Fore.RED)
                 continue
-            conversation_history.append({"role": "user", "content": user_input})
-
-            response = self.get_claude_response(conversation_history)
 
             ColorPrinter.print("\nClaude's Response:", Fore.LIGHTRED_EX)
-            ColorPrinter.print(response, Fore.LIGHTCYAN_EX)
+            self.ask(history, user_input, lambda text: ColorPrinter.write(text, Fore.LIGHTCYAN_EX))
 
-            conversation_history.append({"role": "assistant", "content": response})
+    def ask(self, history: ConversationHistory, question: str, on_text: Optional[Callable[[str], None]] = None) -> str:
+        messages = history.messages()
+        turn_start = len(messages)
+        messages.append({"role": "user", "content": question})
+
+        response = self.get_claude_response(messages, on_text)
+
+        messages.append({"role": "assistant", "content": response})
+        history.add_turn(messages[turn_start:])
+        return response
+
+    @staticmethod
+    def prepare_chat(conversation_history: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        conversation_history.append({"role": "user", "content": PromptLibrary.chatbot()})
+        conversation_history.append({"role": "assistant", "content": "I understand, and am prepared to answer any questions the user may have and use my tools when appropriate."})
+        return conversation_history
+
+class IngestionScheduler:
+    """Runs independent input sources concurrently. A failing source is reported and yields its
+    default value instead of discarding the results of the other sources."""
 
-class StorySlammer:
     def __init__(self):
+        self.sources: Dict[str, tuple] = {}
+        self.results: Dict[str, IngestionResult] = {}
+
+    def add(self, name: str, default: Any, function: Callable[..., Any], *args: Any) -> None:
+        self.sources[name] = (default, function, args)
+
+    def run(self) -> Dict[str, IngestionResult]:
+        if not self.sources:
+            return self.results
+
+        start = time.perf_counter()
+        ColorPrinter.print(f"\nIngesting {', '.join(self.sources)}...", Fore.CYAN)
+        with ThreadPoolExecutor(max_workers=len(self.sources)) as executor:
+            futures = [executor.submit(self.run_source, name, *source) for name, source in self.sources.items()]
+            for future in as_completed(futures):
+                result = future.result()
+                self.results[result.name] = result
+                if result.error:
+                    ColorPrinter.print(f"  {result.name} failed after {result.seconds:.1f}s: {result.error}", Fore.RED)
+                else:
+                    ColorPrinter.print(f"  {result.name} ready in {result.seconds:.1f}s", Fore.CYAN)
+
+        total = sum(result.seconds for result in self.results.values())
+        ColorPrinter.print(f"Ingestion finished in {time.perf_counter() - start:.1f}s ({total:.1f}s of work across sources)", Fore.CYAN)
+        return self.results
+
+    @staticmethod
+    def run_source(name: str, default: Any, function: Callable[..., Any], args: tuple) -> IngestionResult:
+        start = time.perf_counter()
+        try:
+            with Tracer.span(f"ingest.{name}", "ingest"):
+                value = function(*args)
+            return IngestionResult(name, value, time.perf_counter() - start)
+        except Exception as e:
+            return IngestionResult(name, default, time.perf_counter() - start, str(e))
+
+    def value(self, name: str, default: Any = "") -> Any:
+        result = self.results.get(name)
+        return result.value if result else default
+
+class BatchRunner:
+    """Summarizes many cards headlessly, writing one note per card into the vault. Finished cards are
+    recorded in a checkpoint file in the vault so an interrupted batch resumes where it stopped."""
+
+    def __init__(self, ai_assistant: AIAssistant, jira_api: JiraAPI, vault_path: str, concurrency: int = BATCH_CONCURRENCY):
+        self.ai_assistant = ai_assistant
+        self.jira_api = jira_api
+        self.vault_path = vault_path
+        self.concurrency = concurrency
+        self.lock = threading.Lock()
+
+    def run(self, jql: Optional[str] = None, keys: Optional[List[str]] = None, fresh: bool = False) -> Dict[str, str]:
+        if not self.vault_path or not os.path.isdir(self.vault_path):
+            raise ValueError(f"Error: '{self.vault_path}' is not a valid vault folder.")
+
+        query = jql or ",".join(sorted(keys or []))
+        checkpoint_path = os.path.join(self.vault_path, f"{BATCH_CHECKPOINT_PREFIX}{hashlib.sha256(query.encode('utf-8')).hexdigest()[:12]}.json")
+        completed = [] if fresh else self.load_checkpoint(checkpoint_path)
+
+        ColorPrinter.print("Fetching Jira issues for the batch...", Fore.CYAN)
+        issue_data = self.jira_api.get_batch_issue_data(jql, keys)
+        pending = [card for card in issue_data if card not in completed]
+        ColorPrinter.print(f"{len(issue_data)} cards found, {len(issue_data) - len(pending)} already summarized, {len(pending)} to go.", Fore.CYAN)
+
+        failures = {}
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            futures = {executor.submit(self.summarize_card, card, issue_data[card]): card for card in pending}
+            for future in as_completed(futures):
+                card = futures[future]
+                try:
+                    future.result()
+                except Exception as e:
+                    failures[card] = str(e)
+                    ColorPrinter.print(f"  {card} failed: {e}", Fore.RED)
+                    continue
+                with self.lock:
+                    completed.append(card)
+                    self.save_checkpoint(checkpoint_path, query, completed)
+                ColorPrinter.print(f"  {card} summarized ({len(completed)}/{len(issue_data)})", Fore.GREEN)
+
+        if not failures and os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+        return failures
+
+    def summarize_card(self, card: str, jira_issue_data: List[str]) -> None:
+        conversation = StorySlammer.build_conversation(jira_issue_data)
+        with Tracer.span("batch.card", "summary", card=card):
+            FileHandler.write_streamed(os.path.join(self.vault_path, f"{card}.md"), lambda write: self.ai_assistant.generate_summary(conversation, write))
+        # The note is written from Jira alone; its manifest says so, and a later run with notes, images or a
+        # recording sends those as changes instead of trusting the note as up to date
+        SummaryRefresher(self.ai_assistant, self.jira_api).record(card, Config(vault_path=self.vault_path))
+
+    @staticmethod
+    def load_checkpoint(checkpoint_path: str) -> List[str]:
+        if not os.path.exists(checkpoint_path):
+            return []
+        with open(checkpoint_path, 'r', encoding='utf-8') as f:
+            return json.load(f).get("completed", [])
+
+    @staticmethod
+    def save_checkpoint(checkpoint_path: str, query: str, completed: List[str]) -> None:
+        temp_path = f"{checkpoint_path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({"query": query, "completed": completed}, f, indent=4)
+        os.replace(temp_path, checkpoint_path)
+
+class SummaryRefresher:
+    """Keeps a vault note up to date without rewriting it from scratch. A manifest next to the note records
+    what the summary was written from; on rerun only issues matched by a JQL `updated >=` query and inputs
+    whose hash changed are sent, and the model edits the affected sections of the existing note."""
+
+    def __init__(self, ai_assistant: AIAssistant, jira_api: JiraAPI, cache: Optional[ContentCache] = None):
+        self.ai_assistant = ai_assistant
+        self.jira_api = jira_api
+        self.cache = cache
+
+    def refresh(self, jira_card: str, config: Config, on_text: Optional[Callable[[str], None]] = None) -> Optional[str]:
+        """Returns the refreshed summary, or None when there is no usable manifest and the note has to be generated in full."""
+        note_path = os.path.join(config.vault_path, f"{jira_card}.md")
+        manifest = self.load_manifest(jira_card, config.vault_path)
+        if not manifest or not os.path.exists(note_path) or manifest.prompt_hash != self.prompt_hash():
+            return None
+
+        previous_summary = FileHandler.read_file(note_path)
+        checked_at = time.time()
+        minutes = int((checked_at - manifest.checked_at) // 60) + REFRESH_MARGIN_MINUTES
+        updated = self.jira_api.fetch_issues(f"({self.tree_jql(manifest.parent_key)}) AND updated >= -{minutes}m")
+        changed_issues = [issue for issue in updated if manifest.issues.get(issue['key']) != issue['fields']['updated']]
+
+        inputs = self.hash_inputs(config)
+        changed_inputs = [name for name, content_hash in inputs.items() if manifest.inputs.get(name) != content_hash]
+
+        manifest.checked_at = checked_at
+        if not changed_issues and not changed_inputs:
+            ColorPrinter.print(f"{jira_card}.md is up to date, nothing changed since it was written.", Fore.CYAN)
+            self.save_manifest(manifest, config.vault_path)
+            if on_text:
+                on_text(previous_summary)
+            return previous_summary
+
+        ColorPrinter.print(f"Updating {jira_card}.md: {len(changed_issues)} changed issues"
+                           f"{', changed ' + ', '.join(changed_inputs) if changed_inputs else ''}", Fore.CYAN)
+        changes = self.build_changes(previous_summary, changed_issues, changed_inputs, jira_card, manifest.parent_key, config)
+        summary = FileHandler.write_streamed(note_path, lambda write: self.ai_assistant.generate_summary(changes, write), on_text)
+
+        manifest.issues.update((issue['key'], issue['fields']['updated']) for issue in changed_issues)
+        manifest.inputs = inputs
+        self.save_manifest(manifest, config.vault_path)
+        return summary
+
+    def build_changes(self, previous_summary: str, changed_issues: List[Dict[str, Any]], changed_inputs: List[str],
+                      jira_card: str, parent_key: str, config: Config) -> List[Dict[str, Any]]:
+        content = []
+        notes = transcript = ""
+        if "images" in changed_inputs and config.images_path:
+            content.extend({"type": "image", "source": image} for image in DataProcessor.get_image_data(config.images_path, self.cache, config.max_images))
+        if "notes" in changed_inputs and config.notes_path:
+            notes = FileHandler.read_file(config.notes_path)
+        if "recording" in changed_inputs and config.recording_path:
+            transcript = DataProcessor.get_transcript_data(config.recording_path, self.ai_assistant.whisper, config.transcription_workers, self.cache)
+
+        changed_data = ''.join(JiraAPI.format_issues(changed_issues, jira_card, parent_key))
+        if "notes" in changed_inputs:
+            changed_data += f"\n<notes>{notes}</notes>"
+        if "recording" in changed_inputs:
+            changed_data += f"\n<transcript>{transcript}</transcript>"
+        if "images" in changed_inputs:
+            changed_data += "\nThe attached images replace the ones the summary was written from."
+
+        content.append({
+            "type": "text",
+            "text": f"""
+{PromptLibrary.initial_summary()}
+This is the summary you wrote earlier:
+<previous_summary>{previous_summary}</previous_summary>
+Only the following data changed since then (an empty tag means that input was removed):
+<changed>{changed_data}</changed>
+Update the sections of the previous summary affected by these changes and keep every other section exactly as it is.
+Reply with the complete updated summary only.
+"""
+        })
+        return [{"role": "user", "content": content}]
+
+    def snapshot(self, jira_card: str, config: Config) -> Optional[SummaryManifest]:
+        """Records the issue versions ingestion loaded and the input hashes a full summary is generated from,
+        without asking Jira again. Returns None when the card was never loaded, e.g. the Jira source failed."""
+        with self.jira_api.lock:
+            primary_issue = self.jira_api.loaded_issues.get(jira_card)
+            if primary_issue is None:
+                return None
+            parent_key = primary_issue['fields'].get('parent', {}).get('key', jira_card)
+            tree = [issue for issue_key, issue in self.jira_api.loaded_issues.items()
+                    if issue_key == parent_key or issue['fields'].get('parent', {}).get('key') == parent_key]
+            # The oldest search time, so the next refresh also covers changes made since that search
+            checked_at = min(self.jira_api.loaded_at[issue['key']] for issue in tree)
+        return SummaryManifest(
+            card=jira_card,
+            parent_key=parent_key,
+            issues={issue['key']: issue['fields']['updated'] for issue in tree},
+            inputs=self.hash_inputs(config),
+            prompt_hash=self.prompt_hash(),
+            checked_at=checked_at
+        )
+
+    def record(self, jira_card: str, config: Config) -> None:
+        """Writes the manifest of a note that was just generated in full. When the card's issues were not loaded
+        an older manifest no longer describes the note, so it is removed and the next run regenerates it."""
+        manifest = self.snapshot(jira_card, config)
+        if manifest:
+            self.save_manifest(manifest, config.vault_path)
+        elif os.path.exists(self.manifest_path(jira_card, config.vault_path)):
+            os.remove(self.manifest_path(jira_card, config.vault_path))
+
+    @staticmethod
+    def tree_jql(parent_key: str) -> str:
+        return f"issue = {parent_key} OR parent = {parent_key}"
+
+    @staticmethod
+    def prompt_hash() -> str:
+        return hashlib.sha256(f"{CLAUDE_MODEL}|{PromptLibrary.initial_summary()}".encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def hash_inputs(config: Config) -> Dict[str, str]:
+        inputs = {"notes": "", "images": "", "recording": ""}
+        if config.notes_path and os.path.isfile(config.notes_path):
+            inputs["notes"] = ContentCache.hash_file(config.notes_path)
+        if config.recording_path and os.path.isfile(config.recording_path):
+            inputs["recording"] = ContentCache.hash_file(config.recording_path)
+        if config.images_path and os.path.isdir(config.images_path):
+            image_hashes = [ContentCache.hash_file(os.path.join(config.images_path, file)) for file in sorted(os.listdir(config.images_path))
+                            if os.path.splitext(file)[1].lower() in IMAGE_EXTENSIONS]
+            inputs["images"] = hashlib.sha256("|".join(image_hashes).encode('utf-8')).hexdigest() if image_hashes else ""
+        return inputs
+
+    @staticmethod
+    def manifest_path(jira_card: str, vault_path: str) -> str:
+        return os.path.join(vault_path, f"{jira_card}{MANIFEST_SUFFIX}")
+
+    @staticmethod
+    def load_manifest(jira_card: str, vault_path: str) -> Optional[SummaryManifest]:
+        manifest_path = SummaryRefresher.manifest_path(jira_card, vault_path)
+        if not os.path.exists(manifest_path):
+            return None
+        try:
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                return SummaryManifest(**json.load(f))
+        except (OSError, ValueError, TypeError):
+            ColorPrinter.print(f"Warning: {manifest_path} is unreadable, {jira_card}.md will be regenerated.", Fore.YELLOW)
+            return None
+
+    @staticmethod
+    def save_manifest(manifest: SummaryManifest, vault_path: str) -> None:
+        manifest_path = SummaryRefresher.manifest_path(manifest.card, vault_path)
+        temp_path = f"{manifest_path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(asdict(manifest), f, indent=4)
+        os.replace(temp_path, manifest_path)
+
+class StorySlammer:
+    def __init__(self, whisper_client: Optional[OpenAI] = None, claude_client: Optional[anthropic.Anthropic] = None,
+                 jira_client: Optional[JiraClient] = None):
+        """The clients default to the OpenAI, Anthropic and Jira APIs. Any object with the same methods can be
+        passed instead, such as the fake and replay backends in benchmarks/backends.py."""
         self.config = FileHandler.load_config("settings.json")
-        self.jira_api = JiraAPI()
-        self.ai_assistant = AIAssistant(OpenAI(api_key=os.getenv("OPENAI_API_KEY")), anthropic.Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY")))
+        self.cache = ContentCache(max_mb=self.config.cache_max_mb)
+        self.jira_api = JiraAPI(self.cache, jira_client)
+        self.ai_assistant = AIAssistant(whisper_client or LazyLoader(StorySlammer.create_whisper_client),
+                                        claude_client or LazyLoader(StorySlammer.create_claude_client),
+                                        self.jira_api, self.config.tool_max_steps)
 
-    def run(self):
+    @staticmethod
+    def create_whisper_client() -> OpenAI:
+        from openai import OpenAI
+        return OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+
+    @staticmethod
+    def create_claude_client() -> anthropic.Anthropic:
+        import anthropic
+        return anthropic.Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
+
+    def run(self, preset_paths: Optional[Dict[str, str]] = None, accept_config: bool = False, incremental: bool = True):
         ColorPrinter.print(art, Fore.CYAN)
-        ColorPrinter.print(f"Using context with length: {len(context)}", Fore.BLUE)
-        ColorPrinter.print(f"Using initial summary prompt with length: {len(initial_summary_prompt) - len(context)}", Fore.BLUE)
-        ColorPrinter.print(f"Using chatbot prompt with length: {len(chatbot_prompt)}", Fore.BLUE)
+        ColorPrinter.print(f"Using context with length: {len(PromptLibrary.context())}", Fore.BLUE)
+        ColorPrinter.print(f"Using initial summary prompt with length: {len(PromptLibrary.initial_summary()) - len(PromptLibrary.context())}", Fore.BLUE)
+        ColorPrinter.print(f"Using chatbot prompt with length: {len(PromptLibrary.chatbot())}", Fore.BLUE)
+        ColorPrinter.print(f"Cache: {self.cache.describe()}", Fore.BLUE)
         ColorPrinter.print("\nWelcome to Story Slammer!", Fore.CYAN)
         ColorPrinter.print("=========================", Fore.CYAN)
 
         jira_card = ColorPrinter.input("Enter the name of the Jira card you're working on: ", Fore.GREEN)
-        self.update_config()
+        self.update_config(preset_paths, accept_config)
 
-        jira_issue_data = self.jira_api.get_issue_data(jira_card) if jira_card else ""
-        processed_images = DataProcessor.get_image_data(self.config.images_path) if self.config.images_path else ""
-        notes_content = FileHandler.read_file(self.config.notes_path) if self.config.notes_path else ""
-        transcript = DataProcessor.get_transcript_data(self.config.recording_path, self.ai_assistant.whisper) if self.config.recording_path else ""
+        conversation_history = self.ingest(jira_card, self.config)
 
         FileHandler.save_config(self.config, "settings.json")
+        ColorPrinter.print(f"Cache hits this run: {self.cache.hits}, misses: {self.cache.misses}", Fore.BLUE)
         self.print_summary(jira_card)
 
         ColorPrinter.print("\nCommence Artificial Intelligence Procedures...", Fore.RED)
 
+        ColorPrinter.print("\nClaude's Initial Summary:", Fore.LIGHTRED_EX)
+        show_text = lambda text: ColorPrinter.write(text, Fore.GREEN)
+        if self.config.vault_path:
+            summary = self.summarize(jira_card, self.config, conversation_history, self.ai_assistant, show_text, incremental)
+        else:
+            # Without a vault the note is written to the current folder
+            summary = FileHandler.write_streamed(f"{jira_card}.md", lambda write: self.summarize(
+                jira_card, self.config, conversation_history, self.ai_assistant, write, incremental), show_text)
+        conversation_history.append({"role": "assistant", "content": summary})
+
+        if self.config.vault_path:
+            self.ai_assistant.vault_index = VaultIndex(self.config.vault_path).refresh()
+        self.ai_assistant.interactive_conversation(self.ai_assistant.prepare_chat(conversation_history))
+
+    def summarize(self, jira_card: str, config: Config, conversation_history: Optional[List[Dict[str, Any]]] = None,
+                  assistant: Optional[AIAssistant] = None, on_text: Optional[Callable[[str], None]] = None,
+                  incremental: bool = True) -> str:
+        """Writes the card's vault note. A note with a manifest is refreshed incrementally; otherwise the summary
+        is generated in full from conversation_history, which is ingested here when it is not given."""
+        assistant = assistant or self.ai_assistant
+        refresher = SummaryRefresher(assistant, assistant.jira_api, self.cache)
+        if config.vault_path and jira_card and incremental:
+            with Tracer.span("summary.refresh", "summary", card=jira_card) as span:
+                try:
+                    summary = refresher.refresh(jira_card, config, on_text)
+                except requests.exceptions.RequestException as e:
+                    ColorPrinter.print(f"Warning: Could not check Jira for changes ({e}), {jira_card}.md will be regenerated.", Fore.YELLOW)
+                    summary = None
+                span["refreshed"] = summary is not None
+            if summary is not None:
+                return summary
+
+        if conversation_history is None:
+            conversation_history = self.ingest(jira_card, config, jira_api=assistant.jira_api)
+        with Tracer.span("summary.full", "summary", card=jira_card):
+            if not config.vault_path:
+                return assistant.generate_summary(conversation_history, on_text)
+            summary = FileHandler.write_streamed(os.path.join(config.vault_path, f"{jira_card}.md"),
+                                                 lambda write: assistant.generate_summary(conversation_history, write), on_text)
+        refresher.record(jira_card, config)
+        return summary
+
+    def refresh(self, jira_card: str, preset_paths: Optional[Dict[str, str]] = None, incremental: bool = True) -> None:
+        """Brings one card's vault note up to date without prompting or starting a Q&A session."""
+        self.update_config(preset_paths, accept_config=True)
+        if not self.config.vault_path:
+            raise ValueError("Error: A vault folder is required to refresh a summary.")
+        self.summarize(jira_card, self.config, incremental=incremental)
+        ColorPrinter.print(f"Cache hits this run: {self.cache.hits}, misses: {self.cache.misses}", Fore.BLUE)
+
+    def ingest(self, jira_card: str, config: Config, transcription_pool: Optional[ThreadPoolExecutor] = None,
+               jira_api: Optional[JiraAPI] = None) -> List[Dict[str, Any]]:
+        """Collects every configured input concurrently and builds the initial conversation from them.
+        A shared transcription_pool bounds how many recordings are transcribed at the same time. The Jira issues
+        are loaded into jira_api, the session's own JiraAPI in service mode."""
+        jira_api = jira_api or self.jira_api
+        transcribe = DataProcessor.get_transcript_data
+        if transcription_pool:
+            transcribe = lambda *args: transcription_pool.submit(DataProcessor.get_transcript_data, *args).result()
+
+        scheduler = IngestionScheduler()
+        if jira_card:
+            scheduler.add("Jira issues", [], jira_api.get_issue_data, jira_card)
+        if config.images_path:
+            scheduler.add("images", [], DataProcessor.get_image_data, config.images_path, self.cache, config.max_images)
+        if config.notes_path:
+            scheduler.add("notes", "", FileHandler.read_file, config.notes_path)
+        if config.recording_path and config.extract_keyframes:
+            scheduler.add("keyframes", [], DataProcessor.get_keyframe_data, config.recording_path, config.max_keyframes, self.cache)
+        if config.recording_path:
+            scheduler.add("transcript", "", transcribe, config.recording_path, self.ai_assistant.whisper, config.transcription_workers, self.cache)
+        with Tracer.span("ingest", "ingest", card=jira_card, sources=list(scheduler.sources)):
+            scheduler.run()
+        if config.vault_path and scheduler.value("transcript"):
+            self.save_transcript(jira_card, config.vault_path, scheduler.value("transcript"))
+
+        return self.build_conversation(
+            scheduler.value("Jira issues"),
+            scheduler.value("images"),
+            scheduler.value("notes"),
+            scheduler.value("transcript"),
+            scheduler.value("keyframes", [])
+        )
+
+    @staticmethod
+    def save_transcript(jira_card: str, vault_path: str, transcript: str) -> None:
+        """Keeps the transcript in the vault so later Q&A sessions can search it."""
+        transcript_folder = os.path.join(vault_path, VAULT_TRANSCRIPT_DIR)
+        os.makedirs(transcript_folder, exist_ok=True)
+        with open(os.path.join(transcript_folder, f"{jira_card}.md"), 'w', encoding='utf-8') as file:
+            file.write(f"# {jira_card} meeting transcript\n\n{transcript}\n")
+
+    def run_batch(self, jql: Optional[str] = None, keys: Optional[List[str]] = None, vault_path: Optional[str] = None,
+                  concurrency: Optional[int] = None, fresh: bool = False) -> bool:
+        runner = BatchRunner(self.ai_assistant, self.jira_api, vault_path or self.config.vault_path, concurrency or self.config.batch_concurrency)
+        failures = runner.run(jql, keys, fresh)
+        if failures:
+            ColorPrinter.print(f"{len(failures)} cards failed; rerun the same command to retry them.", Fore.RED)
+        return not failures
+
+    @staticmethod
+    def build_conversation(jira_issue_data: List[str], processed_images: List[Dict[str, str]] = None, notes_content: str = "",
+                           transcript: str = "", keyframes: List[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
         conversation_content = []
         if processed_images:
             for image in processed_images:
                 conversation_content.append({"type": "image", "source": image})
+        if keyframes:
+            for keyframe in keyframes:
+                conversation_content.append({"type": "text", "text": KeyframeExtractor.caption(keyframe["time"], transcript)})
+                conversation_content.append({"type": "image", "source": keyframe["source"]})
         
         conversation_content.append({
             "type": "text",
             "text": f"""
-{initial_summary_prompt}
+{PromptLibrary.initial_summary()}
 Here's the data for analysis:
 <jira>{''.join(jira_issue_data)}</jira>
 <notes>{notes_content}</notes>
@@ -444,23 +2384,26 @@ Here's the data for analysis:
 """
         })
 
-        conversation_history = [{"role": "user", "content": conversation_content}]
-        
-        generated_conversation = self.ai_assistant.initial_conversation(conversation_history, self.config.vault_path, jira_card + ".md")
-
-        conversation_history.append({"role": "user", "content": chatbot_prompt})
-        conversation_history.append({"role": "assistant", "content": "I understand, and am prepared to answer any questions the user may have and use my tools when appropriate."})
-
-        self.ai_assistant.interactive_conversation(generated_conversation)
-
-    def update_config(self):
-        self.config.notes_path = self.confirm_path("Your notes file is", self.config.notes_path, "markdown file")
-        self.config.images_path = self.confirm_path("Your images folder is", self.config.images_path, "folder")
-        self.config.recording_path = self.confirm_path("Your recording file is", self.config.recording_path, "video file")
-        self.config.vault_path = self.confirm_path("Your vault folder is", self.config.vault_path, "folder")
+        return [{"role": "user", "content": conversation_content}]
+
+    def update_config(self, preset_paths: Optional[Dict[str, str]] = None, accept_config: bool = False):
+        """Confirms each path interactively, except paths given on the command line and, with
+        accept_config, the ones already in settings.json."""
+        preset_paths = preset_paths or {}
+        for field, prompt, file_type in (
+            ("notes_path", "Your notes file is", "markdown file"),
+            ("images_path", "Your images folder is", "folder"),
+            ("recording_path", "Your recording file is", "video file"),
+            ("vault_path", "Your vault folder is", "folder"),
+        ):
+            if preset_paths.get(field) is not None:
+                setattr(self.config, field, preset_paths[field])
+            elif not accept_config:
+                setattr(self.config, field, self.confirm_path(prompt, getattr(self.config, field), file_type))
 
     def confirm_path(self, prompt: str, current_value: str, file_type: str) -> str:
-        response = ColorPrinter.input(f"{prompt} {f"set to {current_value}" if current_value else "not set"}. Is this correct? [y/n]: ")
+        current = f"set to {current_value}" if current_value else "not set"
+        response = ColorPrinter.input(f"{prompt} {current}. Is this correct? [y/n]: ")
         if response.lower() in ['', 'y', 'yes']:
             return current_value
         
@@ -485,6 +2428,235 @@ Here's the data for analysis:
         ColorPrinter.print(f"Images Folder: {self.config.images_path or 'Not provided'}", Fore.MAGENTA)
         ColorPrinter.print(f"Recording File: {self.config.recording_path or 'Not provided'}", Fore.BLUE)
 
+class ServiceError(Exception):
+    """A client error in a service request, answered with its HTTP status instead of a 500."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+class StorySlammerService:
+    """Long-running local HTTP/JSON API around one StorySlammer, so the Anthropic, OpenAI and Jira
+    clients, the cache and the connection pools stay warm between requests. Each summary starts a chat
+    session kept in memory until it has been idle for idle_seconds.
+
+    POST /summarize  {"card", "notes_path", "images_path", "recording_path", "vault_path"} -> {"session_id", "summary"}
+    POST /ask        {"session_id", "question"} -> {"answer"}
+    DELETE /sessions/<session_id>
+    GET /health
+    GET /stats       per-stage timings, tokens and cost since the service started
+    """
+
+    def __init__(self, story_slammer: StorySlammer, host: str = SERVICE_HOST, port: int = SERVICE_PORT,
+                 idle_seconds: float = SESSION_IDLE_SECONDS, transcription_jobs: int = SERVICE_TRANSCRIPTION_JOBS):
+        self.story_slammer = story_slammer
+        self.idle_seconds = idle_seconds
+        self.transcription_pool = ThreadPoolExecutor(max_workers=transcription_jobs)
+        self.sessions: Dict[str, ChatSession] = {}
+        # One index per vault, shared by every session that uses it
+        self.vault_indexes: Dict[str, VaultIndex] = {}
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.stopped = threading.Event()
+
+        service = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                service.handle(self, "GET")
+
+            def do_POST(self):
+                service.handle(self, "POST")
+
+            def do_DELETE(self):
+                service.handle(self, "DELETE")
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+
+    def serve_forever(self) -> None:
+        threading.Thread(target=self.evict_idle_sessions, daemon=True).start()
+        host, port = self.server.server_address[:2]
+        ColorPrinter.print(f"Story Slammer is listening on http://{host}:{port}", Fore.CYAN)
+        try:
+            self.server.serve_forever()
+        finally:
+            self.stopped.set()
+            self.server.server_close()
+            self.transcription_pool.shutdown(wait=False)
+
+    def shutdown(self) -> None:
+        self.server.shutdown()
+
+    def handle(self, handler: BaseHTTPRequestHandler, method: str) -> None:
+        with Tracer.span(f"http.{method} {(urlsplit(handler.path).path.strip('/') or 'root').split('/')[0]}", "http"):
+            self.route(handler, method)
+
+    def route(self, handler: BaseHTTPRequestHandler, method: str) -> None:
+        try:
+            try:
+                length = int(handler.headers.get("Content-Length") or 0)
+                payload = json.loads(handler.rfile.read(length)) if length else {}
+            except ValueError as e:
+                raise ServiceError(400, f"Invalid request body: {e}")
+            if not isinstance(payload, dict):
+                raise ServiceError(400, "The request body must be a JSON object.")
+            path = handler.path.split("?")[0].rstrip("/")
+
+            if method == "GET" and path == "/health":
+                self.respond(handler, 200, self.health())
+            elif method == "POST" and path == "/summarize":
+                self.respond(handler, 200, self.summarize(payload))
+            elif method == "GET" and path == "/stats":
+                self.respond(handler, 200, {"stages": Tracer.summary()})
+            elif method == "POST" and path == "/ask":
+                self.respond(handler, 200, self.ask(payload))
+            elif method == "DELETE" and path.startswith("/sessions/"):
+                with self.lock:
+                    removed = self.sessions.pop(path.rsplit("/", 1)[-1], None)
+                self.respond(handler, 200 if removed else 404, {"deleted": bool(removed)})
+            else:
+                self.respond(handler, 404, {"error": f"No route for {method} {path}"})
+        except ServiceError as e:
+            self.respond(handler, e.status, {"error": str(e)})
+        except Exception as e:
+            ColorPrinter.print(f"Error handling {method} {handler.path}: {e}", Fore.RED)
+            self.respond(handler, 500, {"error": str(e)})
+
+    def summarize(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        card = str(payload.get("card", "")).strip()
+        if not card:
+            raise ServiceError(400, "'card' is required.")
+        if not CARD_KEY_PATTERN.fullmatch(card):
+            raise ServiceError(400, f"'{card}' is not a Jira issue key such as PROJ-123.")
+
+        for name in ("notes_path", "images_path", "recording_path", "vault_path"):
+            if not isinstance(payload.get(name) or "", str):
+                raise ServiceError(400, f"'{name}' must be a string.")
+        incremental = payload.get("incremental", True)
+        if not isinstance(incremental, bool):
+            raise ServiceError(400, "'incremental' must be true or false.")
+
+        config = replace(
+            self.story_slammer.config,
+            notes_path=payload.get("notes_path") or "",
+            images_path=payload.get("images_path") or "",
+            recording_path=payload.get("recording_path") or "",
+            vault_path=payload.get("vault_path") or ""
+        )
+        for path, file_type in ((config.notes_path, "markdown file"), (config.images_path, "folder"),
+                                (config.recording_path, "video file"), (config.vault_path, "folder")):
+            if not PathSelector.validate_file_path(path, file_type):
+                raise ServiceError(400, f"Invalid {file_type}: '{path}'")
+
+        shared = self.story_slammer.ai_assistant
+        # Each session remembers only the issues it loaded itself, and forgets them when it is evicted;
+        # the pooled client and the on-disk cache are shared
+        jira_api = JiraAPI(self.story_slammer.cache, self.story_slammer.jira_api.client)
+        assistant = AIAssistant(shared.whisper, shared.claude, jira_api, config.tool_max_steps)
+        conversation_history = self.story_slammer.ingest(card, config, self.transcription_pool, jira_api)
+        summary = self.story_slammer.summarize(card, config, conversation_history, assistant, incremental=incremental)
+        conversation_history.append({"role": "assistant", "content": summary})
+        if config.vault_path:
+            with self.lock:
+                vault_index = self.vault_indexes.setdefault(os.path.abspath(config.vault_path), VaultIndex(config.vault_path))
+            assistant.vault_index = vault_index.refresh()
+
+        history = ConversationHistory(assistant.prepare_chat(conversation_history), assistant.summarize_history)
+        session = ChatSession(uuid.uuid4().hex, card, assistant, history, time.time())
+        with self.lock:
+            self.sessions[session.session_id] = session
+        return {"session_id": session.session_id, "summary": summary}
+
+    def ask(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        question = str(payload.get("question", "")).strip()
+        if not question:
+            raise ServiceError(400, "'question' is required.")
+        session_id = str(payload.get("session_id", ""))
+        with self.lock:
+            session = self.sessions.get(session_id)
+            if session is None:
+                raise ServiceError(404, f"Unknown session: {session_id}")
+            session.last_used = time.time()
+
+        # Questions within one session are answered in order, different sessions run in parallel
+        with session.lock:
+            answer = session.assistant.ask(session.history, question)
+            session.last_used = time.time()
+        return {"answer": answer}
+
+    def health(self) -> Dict[str, Any]:
+        with self.lock:
+            session_count = len(self.sessions)
+        return {"status": "ok", "uptime_seconds": round(time.time() - self.started), "sessions": session_count,
+                "cache": self.story_slammer.cache.describe()}
+
+    def evict_idle_sessions(self) -> None:
+        while not self.stopped.wait(min(self.idle_seconds, 60)):
+            cutoff = time.time() - self.idle_seconds
+            with self.lock:
+                idle = [session_id for session_id, session in self.sessions.items() if session.last_used < cutoff and not session.lock.locked()]
+                for session_id in idle:
+                    del self.sessions[session_id]
+            if idle:
+                ColorPrinter.print(f"Evicted {len(idle)} idle sessions", Fore.BLUE)
+
+    @staticmethod
+    def respond(handler: BaseHTTPRequestHandler, status: int, payload: Dict[str, Any]) -> None:
+        data = json.dumps(payload).encode('utf-8')
+        handler.send_response(status)
+        handler.send_header("Content-Type", "application/json")
+        handler.send_header("Content-Length", str(len(data)))
+        handler.end_headers()
+        handler.wfile.write(data)
+
 if __name__ == "__main__":
-    collector = StorySlammer()
-    collector.run()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Summarize Jira cards, notes, images and meeting recordings with AI.")
+    parser.add_argument("--clear-cache", nargs="?", const="all", choices=["all", "transcript", "image", "keyframes", "jira"],
+                        help="Delete cached entries (optionally only one kind) and exit")
+    batch_group = parser.add_mutually_exclusive_group()
+    batch_group.add_argument("--jql", help="Summarize every card matched by this JQL query without prompting")
+    batch_group.add_argument("--keys", help="Summarize a comma separated list of cards without prompting")
+    parser.add_argument("--notes", help="Notes file to use instead of the one in settings.json")
+    parser.add_argument("--images", help="Images folder to use instead of the one in settings.json")
+    parser.add_argument("--recording", help="Recording file to use instead of the one in settings.json")
+    parser.add_argument("--vault", help="Vault folder to use instead of the one in settings.json")
+    parser.add_argument("-y", "--yes", action="store_true", help="Use the paths from settings.json without asking to confirm them")
+    parser.add_argument("--serve", action="store_true", help="Run as a local HTTP/JSON service instead of interactively")
+    parser.add_argument("--host", default=SERVICE_HOST, help="Address the service listens on")
+    parser.add_argument("--port", type=int, default=SERVICE_PORT, help="Port the service listens on")
+    parser.add_argument("--concurrency", type=int, help="Number of cards summarized at the same time in batch mode")
+    parser.add_argument("--fresh", action="store_true", help="Ignore the checkpoint of a previous interrupted batch")
+    parser.add_argument("--refresh", metavar="CARD", help="Bring the vault note of one card up to date without prompting and exit")
+    parser.add_argument("--full", action="store_true", help="Regenerate summaries from scratch instead of updating them incrementally")
+    parser.add_argument("--trace", metavar="PATH", help="Write a Chrome trace (JSON) of every timed stage to PATH when the run ends")
+    args = parser.parse_args()
+
+    if args.clear_cache:
+        removed = ContentCache().clear(None if args.clear_cache == "all" else args.clear_cache)
+        ColorPrinter.print(f"Removed {removed} cached entries.", Fore.CYAN)
+        raise SystemExit(0)
+
+    try:
+        if args.jql or args.keys:
+            keys = [key.strip() for key in args.keys.split(",") if key.strip()] if args.keys else None
+            succeeded = StorySlammer().run_batch(args.jql, keys, args.vault, args.concurrency, args.fresh)
+            raise SystemExit(0 if succeeded else 1)
+        elif args.refresh:
+            preset_paths = {"notes_path": args.notes, "images_path": args.images, "recording_path": args.recording, "vault_path": args.vault}
+            StorySlammer().refresh(args.refresh, preset_paths, not args.full)
+        elif args.serve:
+            StorySlammerService(StorySlammer(), args.host, args.port).serve_forever()
+        else:
+            preset_paths = {"notes_path": args.notes, "images_path": args.images, "recording_path": args.recording, "vault_path": args.vault}
+            collector = StorySlammer()
+            collector.run(preset_paths, args.yes, not args.full)
+    finally:
+        Tracer.print_summary()
+        if args.trace:
+            Tracer.export(args.trace)